@@ -1,31 +1,76 @@
-import yaml
-import copy
-import traceback
 import os
-import importlib
+from collections import ChainMap
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from fastapi import FastAPI, Response, Request
 from fastapi.logger import logger
-from starlette.responses import RedirectResponse
+from starlette.responses import RedirectResponse, StreamingResponse
 
 import core
-from .data.data import Data
+from .data import Data, EventBatcher
 from .protocol import EAmuseProtocol
 from .dispatch import Dispatch
+from .base import Factory
+from .config import ServerConfig, load_yaml
+from .common import LazyStr
 from . import root_exe
 from settings import Settings
 
 app = FastAPI()
 config: Dict[str, Any] = {}
+server_config: Optional[ServerConfig] = None
 
+if os.environ.get('OXYGEN_PROFILE'):
+    # Opt-in profiling. With OXYGEN_PROFILE set, any request with ?profile=1 gets
+    # a pyinstrument report back instead of its normal response. The middleware is
+    # not installed at all otherwise, so there is no cost when profiling is off.
+    from pyinstrument import Profiler  # type: ignore
+    from starlette.responses import HTMLResponse
 
-@app.get('/')
-@app.get('/{path:path}')
-async def receive_healthcheck(path: str, request: Request) -> Response:
-    global config
+    @app.middleware('http')
+    async def profile_request(request: Request, call_next: Any) -> Response:
+        if not request.query_params.get('profile'):
+            return await call_next(request)
+
+        profiler = Profiler(async_mode='enabled')
+        profiler.start()
+        await call_next(request)
+        profiler.stop()
+        return HTMLResponse(profiler.output_html())
+
+_healthcheck_response: Optional[Response] = None
+
+# EAmuseProtocol has no setup cost worth repeating per packet. The only state
+# it keeps is the encoding of the last decoded packet, which receive_request
+# captures and passes back explicitly when encoding the response.
+_PROTO = EAmuseProtocol()
+
+# Fixed responses for the error paths, which get hit a lot by junk traffic.
+_UNRECOGNIZED_RESPONSE = Response(content=b"Unrecognized packet!", status_code=500)
+_NO_RESPONSE_RESPONSE = Response(content=b"No response generated", status_code=404)
+_CRASH_RESPONSE = Response(content=b"Crash when handling packet!", status_code=500)
+
+# We get lots of spam from random bots trying to SOAP us up.
+_SOAP_SPAM_NAMES = frozenset({'soapenv:Envelope', 'soap:Envelope', 'methodCall'})
+
+# Encoded responses larger than this many bytes are streamed to the client.
+_STREAMING_THRESHOLD = 64 * 1024
+
+_event_batcher: Optional[EventBatcher] = None
 
-    frontend_port = config['server'].get('frontend_port')
+_PLUGINS_LOADED = False
+_PLUGIN_FACTORIES: Dict[str, Factory] = {}
+
+
+@app.get('/{path:path}', response_model=None, include_in_schema=False)
+async def receive_healthcheck(request: Request, path: str = '') -> Response:
+    # Built once when the config is loaded, since it only depends on config.
+    if _healthcheck_response is not None:
+        return _healthcheck_response
+    return _build_healthcheck_response(config['server'].get('frontend_port'))
+
+
+def _build_healthcheck_response(frontend_port: Optional[int]) -> Response:
     if frontend_port is None:
         return Response("Please set frontend port in config.")
     else:
@@ -33,35 +78,44 @@ async def receive_healthcheck(path: str, request: Request) -> Response:
         return RedirectResponse(url='localhost:%d' % frontend_port, status_code=308)  # type: ignore
 
 
-@app.post('/')
-@app.post('/{path:path}')
+@app.post('/', response_model=None, include_in_schema=False)
+@app.post('/{path:path}', response_model=None, include_in_schema=False)
 async def receive_request(path: str, request: Request) -> Response:
     global config
 
-    proto = EAmuseProtocol()
     remote_address = request.headers.get('x-remote-address', None)
     compression = request.headers.get('x-compress', None)
     encryption = request.headers.get('x-eamuse-info', None)
     data = await request.body()
-    req = proto.decode(
+    req = _PROTO.decode(
         compression,
         encryption,
         data,
     )
 
+    # The protocol object is shared between requests, so grab the encodings
+    # of this packet now before another request gets decoded while we await.
+    text_encoding = _PROTO.last_text_encoding
+    packet_encoding = _PROTO.last_packet_encoding
+
     if req is None:
         # Nothing to do here
-        return Response("Unrecognized packet!", 500)
-    if req.name in {'soapenv:Envelope', 'soap:Envelope', 'methodCall'}:
+        return _UNRECOGNIZED_RESPONSE
+    if req.name in _SOAP_SPAM_NAMES:
         # We get lots of spam from random bots trying to SOAP
         # us up, so ignore this shit.
-        return Response("Unrecognized packet!", 500)
-
-    # Create and format config
-    requestconfig = copy.copy(config)
-    requestconfig['client'] = {
-        'address': remote_address or request.client.host,
-    }
+        return _UNRECOGNIZED_RESPONSE
+
+    # Create and format config, overlaying the client info on top of the
+    # global config instead of copying it on every request.
+    requestconfig = ChainMap(
+        {
+            'client': {
+                'address': remote_address or request.client.host,
+            },
+        },
+        config,
+    )
 
     dataprovider = Data(requestconfig)
     try:
@@ -70,23 +124,30 @@ async def receive_request(path: str, request: Request) -> Response:
 
         if resp is None:
             # Nothing to do here
-            await dataprovider.local.network.put_event(
+            _event_batcher.put_event(
                 'unhandled_packet',
                 {
-                    'request': str(req),
+                    'request': LazyStr(req.__str__),
                 },
             )
-            return Response("No response generated", 404)
+            return _NO_RESPONSE_RESPONSE
 
         compression = None
 
-        data = proto.encode(
+        length, chunks = _PROTO.encode_chunks(
             compression,
             encryption,
             resp,
+            text_encoding=text_encoding,
+            packet_encoding=packet_encoding,
         )
 
-        response = Response(data)
+        if length > _STREAMING_THRESHOLD:
+            # Large packets are encrypted chunk by chunk in the threadpool as they are
+            # sent, instead of blocking the event loop on the whole thing up front.
+            response = StreamingResponse(chunks, headers={'Content-Length': str(length)})
+        else:
+            response = Response(b''.join(chunks))
 
         # Some old clients are case-sensitive, even though http spec says these
         # shouldn't matter, so capitalize correctly.
@@ -99,54 +160,94 @@ async def receive_request(path: str, request: Request) -> Response:
 
         return response
     except Exception:
-        stack = traceback.format_exc()
-        await dataprovider.local.network.put_event(
+        import sys
+        import traceback
+
+        # Only capture the frame summaries here, without source lines or any references
+        # to the frames themselves. Formatting happens when the batcher writes the event.
+        exc = traceback.TracebackException(*sys.exc_info(), lookup_lines=False)  # type: ignore
+        _event_batcher.put_event(
             'exception',
             {
                 'service': 'xrpc',
-                'request': str(req),
-                'traceback': stack,
+                'request': LazyStr(req.__str__),
+                'traceback': LazyStr(lambda: ''.join(exc.format())),
             },
         )
-        return Response("Crash when handling packet!", 500)
+        return _CRASH_RESPONSE
     finally:
         await dataprovider.close()
 
 
 def load_config(filename: str) -> None:
     global config
+    global server_config
+    global _healthcheck_response
 
-    config.update(yaml.safe_load(open(filename)))
+    config.update(load_yaml(filename))
     config['database']['engine'] = Data.create_engine(config)
     config['settings'] = Settings()
+    server_config = ServerConfig.from_config(config)
+
+    _healthcheck_response = _build_healthcheck_response(server_config.frontend_port)
+
 
 def register_plugins(plugins_root: str) -> None:
-    plugins_list = os.listdir('plugins')
+    global _PLUGINS_LOADED
+
+    if _PLUGINS_LOADED:
+        # Factories register themselves globally with Base, only do this once.
+        return
+
+    import importlib
+
+    with os.scandir(plugins_root) as entries:
+        plugins_list = [
+            entry.name for entry in entries
+            if entry.is_dir() and os.path.isfile(os.path.join(entry.path, "factory.py"))
+        ]
 
     for plugin in plugins_list:
-        plugin_root = os.path.join(plugins_root, plugin)
-        if os.path.isdir(plugin_root):
-            game_factory_filepath = os.path.join(plugin_root, "factory.py")
-            if os.path.exists(game_factory_filepath):
-                factory = importlib.import_module("plugins.%s.factory" % plugin)
-                logger.info('Plugin:%s factory found.' % plugin)
+        factory = importlib.import_module("plugins.%s.factory" % plugin)
+        logger.info('Plugin:%s factory found.' % plugin)
+
+        IIDXFactory = factory.IIDXFactory()
+        IIDXFactory.register_all()
+        _PLUGIN_FACTORIES[plugin] = IIDXFactory
+        logger.info('Plugin:%s factory loaded.' % plugin)
 
-                IIDXFactory = getattr(factory, "IIDXFactory")()
-                IIDXFactory.register_all()
-                logger.info('Plugin:%s factory loaded.' % plugin)
+    _PLUGINS_LOADED = True
 
 
 async def create_database() -> None:
     global config
 
-    if not os.path.exists(os.path.join(root_exe, config['database']['filename'])):
-        _config = copy.copy(config)
-        dataprovider = Data(_config)
+    # Always run this, it creates a missing database and adds any tables or
+    # indexes that an existing database from an older version is missing.
+    dataprovider = Data(config)
+    try:
         await dataprovider.create()
+    finally:
+        await dataprovider.close()
 
 
 @app.on_event("startup")
 async def startup_event():
+    global _event_batcher
+
     load_config(os.path.join(root_exe, "config.yaml"))
     register_plugins(os.path.join(root_exe, "plugins"))
     await create_database()
+
+    _event_batcher = EventBatcher(config)
+    _event_batcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _event_batcher is not None:
+        await _event_batcher.stop()
+
+    # Pooled connections keep their worker threads alive, which would stop the
+    # process from exiting, so close them once nothing else will use the engine.
+    await config['database']['engine'].dispose()
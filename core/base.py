@@ -1,8 +1,8 @@
 import traceback
-from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Type
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
 
 from .common import Model, ValidatedDict, Time
-from .data import Data, UserID
+from .data import Data, Machine, UserID
 
 
 class ProfileCreationException(Exception):
@@ -28,8 +28,22 @@ class Factory:
     Dispatch will look up in order to handle calls.
     """
 
+    __slots__ = ()
+
     MANAGED_CLASSES: List[Type["Base"]] = []
 
+    # Per-factory (game, version, name) and (game, version, get_settings) tuples, along
+    # with the MANAGED_CLASSES list and length they were built from.
+    __managed_cache: Dict[
+        Type["Factory"],
+        Tuple[
+            List[Type["Base"]],
+            int,
+            Tuple[Tuple[str, int, str], ...],
+            Tuple[Tuple[str, int, Callable[[], Dict[str, Any]]], ...],
+        ],
+    ] = {}
+
     @classmethod
     def register_all(cls) -> None:
         """
@@ -61,8 +75,7 @@ class Factory:
                         'traceback': stack,
                     },
                 )
-            for event in events:
-                await data.local.network.put_event(event[0], event[1])
+            await data.local.network.put_events_bulk(events)
 
     @classmethod
     def all_games(cls) -> Iterator[Tuple[str, int, str]]:
@@ -70,8 +83,7 @@ class Factory:
         Given a particular factory, iterate over all game, version combinations.
         Useful for loading things from the DB without wanting to hardcode values.
         """
-        for game in cls.MANAGED_CLASSES:
-            yield (game.game, game.version, game.name)
+        return iter(cls._managed_games()[0])
 
     @classmethod
     def all_settings(cls) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
@@ -79,8 +91,33 @@ class Factory:
         Given a particular factory, iterate over all game, version combinations that
         have settings and return those settings.
         """
-        for game in cls.MANAGED_CLASSES:
-            yield (game.game, game.version, game.get_settings())
+        return (
+            (game, version, get_settings())
+            for (game, version, get_settings) in cls._managed_games()[1]
+        )
+
+    @classmethod
+    def _managed_games(cls) -> Tuple[
+        Tuple[Tuple[str, int, str], ...],
+        Tuple[Tuple[str, int, Callable[[], Dict[str, Any]]], ...],
+    ]:
+        """
+        Return the game, version and name of every class this factory manages, as well
+        as the settings getter for each of them. Built once and reused until the factory's
+        MANAGED_CLASSES changes. Settings are not cached themselves, since get_settings
+        is free to return a new dictionary every time.
+        """
+        managed = cls.MANAGED_CLASSES
+        cached = Factory.__managed_cache.get(cls)
+        if cached is None or cached[0] is not managed or cached[1] != len(managed):
+            cached = (
+                managed,
+                len(managed),
+                tuple((game.game, game.version, game.name) for game in managed),
+                tuple((game.game, game.version, game.get_settings) for game in managed),
+            )
+            Factory.__managed_cache[cls] = cached
+        return (cached[2], cached[3])
 
     @classmethod
     def create(cls, data: Data, config: Dict[str, Any], model: Model, parentmodel: Optional[Model] = None) -> Optional['Base']:
@@ -110,8 +147,14 @@ class Base:
     non-game startup packets, and simple code for loading/storing profiles.
     """
 
+    # A game class is instantiated for every packet, so skip the per-instance dict.
+    # Subclasses that set attributes of their own should declare their own __slots__.
+    __slots__ = ('data', 'config', 'model', '_machine_cached')
+
     __registered_games: Dict[str, Type[Factory]] = {}
     __registered_handlers: Set[Type[Factory]] = set()
+    __all_games_cache: Optional[Tuple[Tuple[str, int, str], ...]] = None
+    __all_settings_cache: Optional[Tuple[Tuple[str, int, Callable[[], Dict[str, Any]]], ...]] = None
 
     """
     Override this in your subclass.
@@ -132,6 +175,7 @@ class Base:
         self.data = data
         self.config = config
         self.model = model
+        self._machine_cached: Optional[Machine] = None
 
     @classmethod
     def create(cls, data: Data, config: Dict[str, Any], model: Model, parentmodel: Optional[Model] = None) -> Optional['Base']:
@@ -176,6 +220,8 @@ class Base:
         """
         cls.__registered_games[game] = handler
         cls.__registered_handlers.add(handler)
+        Base.__all_games_cache = None
+        Base.__all_settings_cache = None
 
     @classmethod
     def run_scheduled_work(cls, data: Data, config: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
@@ -197,9 +243,13 @@ class Base:
         Given all registered factories, iterate over all game, version combinations.
         Useful for loading things from the DB without wanting to hardcode values.
         """
-        for factory in cls.__registered_handlers:
-            for game in factory.MANAGED_CLASSES:
-                yield (game.game, game.version, game.name)
+        if Base.__all_games_cache is None:
+            Base.__all_games_cache = tuple(
+                entry
+                for factory in cls.__registered_handlers
+                for entry in factory._managed_games()[0]
+            )
+        return iter(Base.__all_games_cache)
 
     @classmethod
     def all_settings(cls) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
@@ -207,9 +257,16 @@ class Base:
         Given all registered factories, iterate over all game, version combinations that
         have settings and return those settings.
         """
-        for factory in cls.__registered_handlers:
-            for game in factory.MANAGED_CLASSES:
-                yield (game.game, game.version, game.get_settings())
+        if Base.__all_settings_cache is None:
+            Base.__all_settings_cache = tuple(
+                entry
+                for factory in cls.__registered_handlers
+                for entry in factory._managed_games()[1]
+            )
+        return (
+            (game, version, get_settings())
+            for (game, version, get_settings) in Base.__all_settings_cache
+        )
 
     def extra_services(self) -> List[str]:
         """
@@ -291,13 +348,13 @@ class Base:
 
         Returns:
             A list of tuples with the User ID and dictionary representing the user's profile,
-            or an empty dictionary if nothing was found.
+            or an empty dictionary if nothing was found. Duplicate user IDs are only returned
+            once, in the order they first appear in userids.
         """
-        userids = list(set(userids))
         profiles = await self.data.local.user.get_any_profiles(self.game, self.version, userids)
         return [
             (userid, profile if profile is not None else ValidatedDict())
-            for (userid, profile) in profiles
+            for (userid, profile) in profiles.items()
         ]
 
     async def put_profile(self, userid: UserID, profile: ValidatedDict) -> None:
@@ -342,17 +399,15 @@ class Base:
                 settings[key] = extra_stats[key]
 
         settings.replace_int('total_plays', settings.get_int('total_plays') + 1)
-        settings.replace_int('first_play_timestamp', settings.get_int('first_play_timestamp', int(Time.now())))
-        settings.replace_int('last_play_timestamp', int(Time.now()))
+        # Read the clock once so every field below agrees on when this play happened.
+        now = Time.now()
+        settings.replace_int('first_play_timestamp', settings.get_int('first_play_timestamp', now))
+        settings.replace_int('last_play_timestamp', now)
 
         last_play_date = settings.get_int_array('last_play_date', 3)
-        today_play_date = Time.todays_date()
-        yesterday_play_date = Time.yesterdays_date()
-        if (
-                last_play_date[0] == today_play_date[0] and
-                last_play_date[1] == today_play_date[1] and
-                last_play_date[2] == today_play_date[2]
-        ):
+        today_play_date = Time.date_from_timestamp(now)
+        yesterday_play_date = Time.date_from_timestamp(now - Time.SECONDS_IN_DAY)
+        if last_play_date == today_play_date:
             # We already played today, add one
             settings.replace_int('today_plays', settings.get_int('today_plays') + 1)
         else:
@@ -361,11 +416,7 @@ class Base:
 
             # We haven't played yet today, reset to one
             settings.replace_int('today_plays', 1)
-            if (
-                    last_play_date[0] == yesterday_play_date[0] and
-                    last_play_date[1] == yesterday_play_date[1] and
-                    last_play_date[2] == yesterday_play_date[2]
-            ):
+            if last_play_date == yesterday_play_date:
                 # We played yesterday, add one to consecutive days
                 settings.replace_int('consecutive_days', settings.get_int('consecutive_days') + 1)
             else:
@@ -376,24 +427,45 @@ class Base:
         # Save back
         await self.data.local.game.put_settings(self.game, userid, settings)
 
+    def set_machine(self, machine: Machine) -> None:
+        """
+        Hand this game instance the machine that sent the request, for when the
+        caller has already looked it up, so that _machine doesn't fetch it again.
+
+        Parameters:
+            machine - The Machine matching config['machine']['pcbid'].
+        """
+        self._machine_cached = machine
+
+    async def _machine(self) -> Machine:
+        """
+        Look up the machine that sent this request. The machine is only fetched
+        once per game instance, since a single packet often needs it several times.
+        Updates through update_machine_name/update_machine_data are made to this
+        same object, so it stays current after they are saved.
+        """
+        if self._machine_cached is None:
+            self._machine_cached = await self.data.local.machine.get_machine(self.config['machine']['pcbid'])
+        return self._machine_cached
+
     async def get_machine_id(self) -> int:
-        machine = await self.data.local.machine.get_machine(self.config['machine']['pcbid'])
+        machine = await self._machine()
         return machine.id
 
     async def update_machine_name(self, newname: Optional[str]) -> None:
         if newname is None:
             return
-        machine = await self.data.local.machine.get_machine(self.config['machine']['pcbid'])
+        machine = await self._machine()
         machine.name = newname
         await self.data.local.machine.put_machine(machine)
 
     async def update_machine_data(self, newdata: Dict[str, Any]) -> None:
-        machine = await self.data.local.machine.get_machine(self.config['machine']['pcbid'])
+        machine = await self._machine()
         machine.data.update(newdata)
         await self.data.local.machine.put_machine(machine)
 
     async def get_game_config(self) -> ValidatedDict:
-        machine = await self.data.local.machine.get_machine(self.config['machine']['pcbid'])
+        machine = await self._machine()
         if machine.arcade is not None:
             settings = await self.data.local.machine.get_settings(machine.arcade, self.game, self.version, 'game_config')
         else:
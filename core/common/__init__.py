@@ -7,6 +7,7 @@ from .id import ID
 from .aes import AESCipher
 from .time import Time
 from .parallel import Parallel
+from .lazystr import LazyStr
 
 
 __all__ = [
@@ -22,5 +23,6 @@ __all__ = [
     "AESCipher",
     "Time",
     "Parallel",
+    "LazyStr",
     "intish",
 ]
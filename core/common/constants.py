@@ -31,6 +31,12 @@ class DBConstants:
     # will only be found in the DB itself, as well as used on the frontend
     # to display various general information about scores.
 
+    # These are deliberately plain ints and not an IntEnum. Many of them share
+    # a value (clear statuses and dan ranks both count up by 100), which an
+    # enum would silently collapse into aliases of each other. They also get
+    # str()'d into packet nodes, where Python before 3.11 renders an IntEnum
+    # member by name instead of by value.
+
     OMNIMIX_VERSION_BUMP: Final[int] = 10000
 
     IIDX_CLEAR_STATUS_NO_PLAY: Final[int] = 50
@@ -0,0 +1,27 @@
+from typing import Any, Callable
+
+
+class LazyStr:
+    """
+    A placeholder for a string that is expensive to build, such as a formatted
+    request or traceback. The callable is only invoked when the value is actually
+    converted to a string, for example when an event gets serialized to the DB.
+    """
+
+    __slots__ = ('__func',)
+
+    def __init__(self, func: Callable[[], Any]) -> None:
+        """
+        Initialize the placeholder.
+
+        Parameters:
+            func - A callable taking no arguments whose return value, converted with
+                   str(), is the value of this string.
+        """
+        self.__func = func
+
+    def __str__(self) -> str:
+        return str(self.__func())
+
+    def __repr__(self) -> str:
+        return f'LazyStr({self.__func!r})'
@@ -1,5 +1,6 @@
 import calendar
 import datetime
+import time
 from dateutil import tz
 
 from typing import List, Optional
@@ -22,7 +23,8 @@ class Time:
         """
         Returns the current unix timestamp in the UTC timezone.
         """
-        return calendar.timegm(datetime.datetime.utcnow().timetuple())
+        # Unix timestamps are UTC by definition, so there's no need to go through datetime.
+        return time.time_ns() // 1000000000
 
     @staticmethod
     def end_of_today() -> int:
@@ -0,0 +1,134 @@
+import copy
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from typing_extensions import Final
+
+import yaml
+
+# Prefer the libyaml bindings, they are an order of magnitude faster than
+# the pure python loader. Not every PyYAML build ships with them though.
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader  # type: ignore
+
+# Prefer orjson for the sidecar, but the stdlib json module works just as well.
+try:
+    import orjson  # type: ignore
+
+    def _json_dumps(data: Any) -> bytes:
+        return orjson.dumps(data)
+
+    def _json_loads(data: bytes) -> Any:
+        return orjson.loads(data)
+except ImportError:
+    def _json_dumps(data: Any) -> bytes:
+        return json.dumps(data).encode('utf-8')
+
+    def _json_loads(data: bytes) -> Any:
+        return json.loads(data)
+
+YAML_CACHE_SIZE: Final[int] = 16
+
+# Parsed YAML files keyed by filename, stored alongside the mtime and size of
+# the file at the time it was parsed so we can tell when it has changed.
+_YAML_CACHE: "OrderedDict[str, Tuple[int, int, Dict[str, Any]]]" = OrderedDict()
+
+
+def load_yaml(filename: str) -> Dict[str, Any]:
+    """
+    Given a YAML filename, parse it and return the resulting structure.
+
+    Parsed files are cached in-process until the file on disk changes. Additionally,
+    a JSON copy of the parsed file is written next to it so that a fresh process
+    can skip YAML parsing entirely as long as the YAML file hasn't been touched.
+
+    Parameters:
+        filename - Path to the YAML file to load.
+
+    Returns:
+        A dictionary representing the parsed file. The caller owns this copy and
+        is free to modify it.
+    """
+    st = os.stat(filename)
+
+    cached = _YAML_CACHE.get(filename)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        _YAML_CACHE.move_to_end(filename)
+        return copy.deepcopy(cached[2])
+
+    # The sidecar holds the parsed file as plain JSON data along with the mtime and size
+    # of the YAML it was parsed from, so it is only trusted when both still match.
+    sidecar = filename + '.cache'
+    parsed = None
+    try:
+        with open(sidecar, 'rb') as fp:
+            cached = _json_loads(fp.read())
+        if cached['mtime_ns'] == st.st_mtime_ns and cached['size'] == st.st_size:
+            parsed = cached['data']
+    except Exception:
+        # Missing or corrupt sidecar, fall back to the YAML itself
+        parsed = None
+
+    if parsed is None:
+        # Hand libyaml the whole file at once rather than having it read through a file object.
+        with open(filename, 'rb') as fp:
+            raw = fp.read()
+        parsed = yaml.load(raw, Loader=_Loader)
+
+        try:
+            data = _json_dumps({'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'data': parsed})
+            # JSON can't represent everything YAML can, such as integer keys or dates, so
+            # only write the sidecar if it gives back exactly what we parsed.
+            if _json_loads(data)['data'] == parsed:
+                # Write to a temporary file first so another process never sees half a sidecar.
+                temp = f'{sidecar}.{os.getpid()}'
+                with open(temp, 'wb') as fp:
+                    fp.write(data)
+                os.replace(temp, sidecar)
+        except (OSError, TypeError, ValueError):
+            # Not fatal, we will just parse the YAML again next time.
+            pass
+
+    _YAML_CACHE[filename] = (st.st_mtime_ns, st.st_size, copy.deepcopy(parsed))
+    _YAML_CACHE.move_to_end(filename)
+    while len(_YAML_CACHE) > YAML_CACHE_SIZE:
+        _YAML_CACHE.popitem(last=False)
+
+    return parsed
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    """
+    The 'server' section of the config file. Built once when the config is loaded,
+    so that request handlers can read it with attribute lookups instead of walking
+    the config dictionary, and so that nothing can change it while serving.
+    """
+
+    __slots__ = ('host', 'backend_port', 'frontend_port')
+
+    host: str
+    backend_port: int
+    frontend_port: Optional[int]
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ServerConfig":
+        """
+        Given a loaded config structure, pull out the server section.
+
+        Parameters:
+            config - A config structure with a 'server' section.
+
+        Returns:
+            A ServerConfig representing that section.
+        """
+        server = config['server']
+        return cls(
+            host=server['host'],
+            backend_port=server['backend_port'],
+            frontend_port=server.get('frontend_port'),
+        )
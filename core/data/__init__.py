@@ -1,4 +1,5 @@
 from .data import Data, DBCreateException
+from .events import EventBatcher
 from .exceptions import ScoreSaveException
 from .types import User, Achievement, Machine, Arcade, Score, Attempt, News, Link, Song, Event, Server, Client, UserID, ArcadeID
 
@@ -6,6 +7,7 @@ from .types import User, Achievement, Machine, Arcade, Score, Attempt, News, Lin
 __all__ = [
     "Data",
     "DBCreateException",
+    "EventBatcher",
     "ScoreSaveException",
     "User",
     "Achievement",
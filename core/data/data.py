@@ -1,12 +1,15 @@
 import os
+from functools import cached_property
 from typing import Dict, Any
 from asyncio import current_task
 
+from sqlalchemy import event  # type: ignore
 from sqlalchemy.ext.asyncio import create_async_engine  # type: ignore
 from sqlalchemy.ext.asyncio import async_scoped_session  # type: ignore
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.engine import Engine  # type: ignore
+from sqlalchemy.engine import Connection, Engine  # type: ignore
+from sqlalchemy.pool import AsyncAdaptedQueuePool  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
 from sqlalchemy.exc import ProgrammingError  # type: ignore
 
@@ -28,21 +31,34 @@ class LocalProvider:
     """
     A wrapper object for implementing local data operations only. Right
     now this goes to the MySQL classes and talks to the backend DB.
+
+    Each data class is only constructed the first time it is used, since
+    most requests only ever touch one or two of them.
     """
 
-    def __init__(
-            self,
-            user: UserData,
-            music: MusicData,
-            machine: MachineData,
-            game: GameData,
-            network: NetworkData,
-    ) -> None:
-        self.user = user
-        self.music = music
-        self.machine = machine
-        self.game = game
-        self.network = network
+    def __init__(self, config: Dict[str, Any], session: async_scoped_session) -> None:
+        self.__config = config
+        self.__session = session
+
+    @cached_property
+    def user(self) -> UserData:
+        return UserData(self.__config, self.__session)
+
+    @cached_property
+    def music(self) -> MusicData:
+        return MusicData(self.__config, self.__session)
+
+    @cached_property
+    def machine(self) -> MachineData:
+        return MachineData(self.__config, self.__session)
+
+    @cached_property
+    def game(self) -> GameData:
+        return GameData(self.__config, self.__session)
+
+    @cached_property
+    def network(self) -> NetworkData:
+        return NetworkData(self.__config, self.__session)
 
 
 class Data:
@@ -52,60 +68,102 @@ class Data:
     and storing data.
     """
 
+    # Session factories keyed by engine. These only depend on the engine, so there
+    # is no reason to build a new one for every Data object.
+    __session_factories: Dict[Engine, sessionmaker] = {}
+
     def __init__(self, config: Dict[str, Any]) -> None:
         """
-        Initializes the data object.
+        Initializes the data object. This is cheap, no connection is checked out of
+        the engine's pool until the first query, and close() returns it to the pool.
+        The individual data classes are likewise only created when first accessed.
 
         Parameters:
             config - A config structure with a 'database' section which is used
                      to initialize an internal DB connection.
         """
-        async_session_factory = sessionmaker(
-            bind=config['database']['engine'],
-            autoflush=True,
-            # autocommit=True,
-            class_=AsyncSession
-        )
         self.__config = config
-        self.__session = async_scoped_session(async_session_factory, scopefunc=current_task)
-        self.__url = Data.sqlalchemy_url(config)
-        self.__user = UserData(config, self.__session)
-        self.__music = MusicData(config, self.__session)
-        self.__machine = MachineData(config, self.__session)
-        self.__game = GameData(config, self.__session)
-        self.__network = NetworkData(config, self.__session)
-        self.local = LocalProvider(
-            self.__user,
-            self.__music,
-            self.__machine,
-            self.__game,
-            self.__network
+        self.__session = async_scoped_session(
+            Data.__session_factory(config['database']['engine']),
+            scopefunc=current_task,
         )
 
+    @cached_property
+    def local(self) -> LocalProvider:
+        return LocalProvider(self.__config, self.__session)
+
+    @classmethod
+    def __session_factory(cls, engine: Engine) -> sessionmaker:
+        factory = Data.__session_factories.get(engine)
+        if factory is None:
+            factory = sessionmaker(
+                bind=engine,
+                autoflush=True,
+                # autocommit=True,
+                class_=AsyncSession
+            )
+            Data.__session_factories[engine] = factory
+        return factory
+
     @classmethod
     def sqlalchemy_url(cls, config: Dict[str, Any]) -> str:
         return f"sqlite+aiosqlite:///{os.path.join(root_exe, config['database']['filename'])}"
 
     @classmethod
     def create_engine(cls, config: Dict[str, Any]) -> Engine:
-        return create_async_engine(
+        # Depending on the SQLAlchemy version, file-backed aiosqlite engines may default to
+        # NullPool, which opens a fresh connection (and thread) for every checkout. Keep a
+        # real pool instead, handing out the most recently used connection first so its
+        # page cache is warm. The DB is local, so there is no need to ping on checkout.
+        engine = create_async_engine(
             Data.sqlalchemy_url(config),
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=16,
+            max_overflow=32,
+            pool_use_lifo=True,
+            pool_pre_ping=False,
             pool_recycle=3600,
             echo=core.DEBUG
         )
+        event.listen(engine.sync_engine, 'connect', Data.__set_pragmas)
+        return engine
+
+    @staticmethod
+    def __set_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+        # Runs once per new pooled connection. WAL lets readers carry on while a score
+        # is being written, and with WAL a NORMAL sync is still safe against corruption.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
 
     async def create(self) -> None:
         """
-        Create any tables that need to be created.
+        Create any tables and indexes that need to be created. Safe to call on an
+        existing database, anything that already exists is left alone.
         """
         async with self.__config["database"]["engine"].begin() as conn:
-            await conn.run_sync(metadata.create_all, checkfirst=True)
+            await conn.run_sync(Data.__create_all)
+
+    @staticmethod
+    def __create_all(conn: Connection) -> None:
+        metadata.create_all(conn, checkfirst=True)
+
+        # create_all skips tables that already exist, including any indexes added to
+        # them since, so make sure those exist on databases created by older versions.
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
 
     async def close(self) -> None:
         """
         Close any open data connection.
         """
-        # Make sure we don't leak connections between web requests
+        # Make sure we don't leak connections between web requests. This hands the
+        # connection back to the engine's pool rather than actually closing it.
         if self.__session is not None:
             await self.__session.close()
             self.__session = None
@@ -0,0 +1,98 @@
+import asyncio
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+from typing_extensions import Final
+
+from .data import Data
+
+
+class EventBatcher:
+    """
+    An object that collects audit events and writes them to the DB in batches
+    from a background task. This lets request handlers log an event without
+    waiting on a DB roundtrip, and lets bursts of events share a single insert.
+    """
+
+    MAX_BATCH_SIZE: Final[int] = 64
+    MAX_BATCH_DELAY: Final[float] = 0.01
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """
+        Initialize the batcher. Must be called from within a running event loop.
+
+        Parameters:
+            config - A config structure with a 'database' section, used to create
+                     a Data object for each batch that gets written.
+        """
+        self.__config = config
+        self.__queue: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue()
+        self.__task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        """
+        Start the background task that writes queued events.
+        """
+        if self.__task is None:
+            self.__task = asyncio.ensure_future(self.__run())
+
+    async def stop(self) -> None:
+        """
+        Write any queued events and stop the background task.
+        """
+        if self.__task is not None:
+            self.__queue.put_nowait(None)
+            await self.__task
+            self.__task = None
+
+    def put_event(self, event: str, data: Dict[str, Any]) -> None:
+        """
+        Queue an event to be written to the audit log. Returns immediately.
+
+        Parameters:
+            event - String event type.
+            data - Dictionary of values for the event.
+        """
+        self.__queue.put_nowait((event, data))
+
+    async def __run(self) -> None:
+        loop = asyncio.get_event_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self.__queue.get()
+            if item is None:
+                break
+            events: List[Tuple[str, Dict[str, Any]]] = [item]
+
+            # Give other events a short window to show up so they can share this insert.
+            deadline = loop.time() + self.MAX_BATCH_DELAY
+            while len(events) < self.MAX_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.__queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                events.append(item)
+
+            await self.__flush(events)
+
+    async def __flush(self, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        data: Optional[Data] = None
+        try:
+            data = Data(self.__config)
+            await data.local.network.put_events_bulk(events)
+        except Exception:
+            # Never let a failed write take down the batcher itself.
+            print(f'Failed to write {len(events)} audit events, they have been dropped!')
+            print(traceback.format_exc())
+        finally:
+            if data is not None:
+                try:
+                    await data.close()
+                except Exception:
+                    print(traceback.format_exc())
@@ -1,15 +1,25 @@
 import json
 import random
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 
-from ...common import Time
+from ...common import LazyStr, Time
 
 from sqlalchemy.engine.base import Connection  # type: ignore
 from sqlalchemy.engine import CursorResult  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
+from sqlalchemy.sql.base import Executable  # type: ignore
+from sqlalchemy.sql.elements import TextClause  # type: ignore
+from sqlalchemy.sql.dml import UpdateBase  # type: ignore
 from sqlalchemy.types import String, Integer  # type: ignore
 from sqlalchemy import Table, Column, MetaData  # type: ignore
 
+# Prefer orjson, it is several times faster than the stdlib json module for
+# the profile and score blobs we read and write on nearly every request.
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
 metadata = MetaData()
 
 """
@@ -27,12 +37,41 @@ session = Table(
 )
 
 
+def _serialize_default(obj: Any) -> Any:
+    if isinstance(obj, bytes):
+        # We're abusing lists here, we have a mixed type
+        return ['__bytes__'] + [b for b in obj]  # type: ignore
+    if isinstance(obj, LazyStr):
+        # Deferred until now so that nothing is formatted unless it gets stored
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
 class _BytesEncoder(json.JSONEncoder):
     def default(self, obj: Any) -> Any:
-        if isinstance(obj, bytes):
-            # We're abusing lists here, we have a mixed type
-            return ['__bytes__'] + [b for b in obj]  # type: ignore
-        return json.JSONEncoder.default(self, obj)
+        return _serialize_default(obj)
+
+
+def _deserialize_fix(jd: Any) -> Any:
+    if type(jd) == dict:
+        # Fix each element in the dictionary.
+        for key in jd:
+            jd[key] = _deserialize_fix(jd[key])
+        return jd
+
+    if type(jd) == list:
+        # Could be serialized by us, could be a normal list.
+        if len(jd) >= 1 and jd[0] == '__bytes__':
+            # This is a serialized bytestring
+            return bytes(jd[1:])
+
+        # Possibly one of these is a dictionary/list/serialized.
+        for i in range(len(jd)):
+            jd[i] = _deserialize_fix(jd[i])
+        return jd
+
+    # Normal value, its deserialized version is itself.
+    return jd
 
 
 class BaseData:
@@ -53,38 +92,84 @@ class BaseData:
         self.__config = config
         self.__conn = conn
 
-    async def execute(self, sql: str, params: Optional[Dict[str, Any]] = None, safe_write_operation: bool = False) -> CursorResult:
+    async def execute(
+        self,
+        sql: Union[str, Executable],
+        params: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+        safe_write_operation: bool = False,
+    ) -> CursorResult:
         """
         Given a SQL string and some parameters, execute the query and return the result.
 
         Parameters:
-            sql - The SQL statement to execute.
+            sql - The SQL statement to execute. This can also be a prebuilt text() clause or
+                  a SQLAlchemy Core statement, which skips rebuilding the statement on every
+                  call. Core selects return rows that can be unpacked positionally.
             params - Dictionary of parameters which will be substituted into the sql string.
+                     If a list of dictionaries is given instead, the statement is executed
+                     once for each of them in a single roundtrip.
 
         Returns:
             A SQLAlchemy CursorResult object.
         """
-        if self.__config['database'].get('read_only', False):
-            # See if this is an insert/update/delete
-            for write_statement in [
-                "insert into ",
-                "update ",
-                "delete from ",
-            ]:
-                if write_statement in sql.lower() and not safe_write_operation:
-                    raise Exception('Read-only mode is active!')
+        sql = self.__prepare(sql, safe_write_operation)
         result = await self.__conn.execute(
-            text(sql),
+            sql,
             params if params is not None else {},
         )
         await self.__conn.commit()
 
         return result
 
+    async def execute_batch(
+        self,
+        statements: Sequence[Tuple[Union[str, Executable], Union[Dict[str, Any], List[Dict[str, Any]]]]],
+        safe_write_operation: bool = False,
+    ) -> None:
+        """
+        Given a list of SQL statements and their parameters, execute all of them in a single
+        transaction. Either every statement takes effect or, if any of them raises, none do.
+
+        Parameters:
+            statements - A list of tuples of a SQL statement and its parameters, each
+                         taking the same form as the arguments to execute().
+        """
+        prepared = [(self.__prepare(sql, safe_write_operation), params) for (sql, params) in statements]
+        try:
+            for (sql, params) in prepared:
+                await self.__conn.execute(sql, params)
+        except Exception:
+            await self.__conn.rollback()
+            raise
+        await self.__conn.commit()
+
+    def __prepare(self, sql: Union[str, Executable], safe_write_operation: bool) -> Executable:
+        """
+        Given a SQL string or statement, return an executable statement, enforcing
+        read-only mode if it is enabled.
+        """
+        if isinstance(sql, str):
+            sql = text(sql)
+        if self.__config['database'].get('read_only', False) and not safe_write_operation:
+            if isinstance(sql, TextClause):
+                # See if this is an insert/update/delete
+                for write_statement in [
+                    "insert into ",
+                    "update ",
+                    "delete from ",
+                ]:
+                    if write_statement in sql.text.lower():
+                        raise Exception('Read-only mode is active!')
+            elif isinstance(sql, UpdateBase):
+                raise Exception('Read-only mode is active!')
+        return sql
+
     def serialize(self, data: Dict[str, Any]) -> str:
         """
         Given an arbitrary dict, serialize it to JSON.
         """
+        if orjson is not None:
+            return orjson.dumps(data, default=_serialize_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
         return json.dumps(data, cls=_BytesEncoder)
 
     def deserialize(self, data: Optional[str]) -> Dict[str, Any]:
@@ -94,28 +179,9 @@ class BaseData:
         if data is None:
             return {}
 
-        def fix(jd: Any) -> Any:
-            if type(jd) == dict:
-                # Fix each element in the dictionary.
-                for key in jd:
-                    jd[key] = fix(jd[key])
-                return jd
-
-            if type(jd) == list:
-                # Could be serialized by us, could be a normal list.
-                if len(jd) >= 1 and jd[0] == '__bytes__':
-                    # This is a serialized bytestring
-                    return bytes(jd[1:])
-
-                # Possibly one of these is a dictionary/list/serialized.
-                for i in range(len(jd)):
-                    jd[i] = fix(jd[i])
-                return jd
-
-            # Normal value, its deserialized version is itself.
-            return jd
-
-        return fix(json.loads(data))
+        if orjson is not None:
+            return _deserialize_fix(orjson.loads(data))
+        return _deserialize_fix(json.loads(data))
 
     async def _from_session(self, session: str, sesstype: str) -> Optional[int]:
         """
@@ -183,6 +183,62 @@ class MachineData(BaseData):
             self.deserialize(result['data']),
         )
 
+    async def get_machine_with_arcade(self, pcbid: str) -> Optional[Tuple[Machine, Optional[Arcade]]]:
+        """
+        Given a PCBID, look up a machine along with the arcade it belongs to, in a single query.
+
+        Parameters:
+            pcbid - The PCBID as returned from a game.
+
+        Returns:
+            None if the machine was not found. Otherwise, a tuple of a Machine object and either
+            an Arcade object for the arcade owning it or None if it isn't part of an arcade.
+        """
+        sql = (
+            "SELECT machine.name AS name, machine.description AS description, machine.arcadeid AS arcadeid, " +
+            "machine.id AS id, machine.port AS port, machine.game AS game, machine.version AS version, machine.data AS data, " +
+            "arcade.id AS arcade_id, arcade.name AS arcade_name, arcade.description AS arcade_description, " +
+            "arcade.pin AS arcade_pin, arcade.data AS arcade_data, " +
+            "(SELECT group_concat(arcade_owner.userid) FROM arcade_owner WHERE arcade_owner.arcadeid = machine.arcadeid) AS arcade_owners " +
+            "FROM machine LEFT JOIN arcade ON arcade.id = machine.arcadeid WHERE machine.pcbid = :pcbid"
+        )
+        cursor = await self.execute(sql, {'pcbid': pcbid})
+
+        result = cursor.fetchone()
+
+        if result is None:
+            # Machine doesn't exist
+            return None
+
+        pcb = Machine(
+            result['id'],
+            pcbid,
+            result['name'],
+            result['description'],
+            result['arcadeid'],
+            result['port'],
+            result['game'],
+            result['version'],
+            self.deserialize(result['data']),
+        )
+
+        if result['arcade_id'] is None:
+            # Not in an arcade, or the arcade doesn't exist
+            return (pcb, None)
+
+        owners = result['arcade_owners']
+        return (
+            pcb,
+            Arcade(
+                ArcadeID(result['arcade_id']),
+                result['arcade_name'],
+                result['arcade_description'],
+                result['arcade_pin'],
+                self.deserialize(result['arcade_data']),
+                [UserID(int(owner)) for owner in owners.split(',')] if owners else [],
+            ),
+        )
+
     async def get_all_machines(self, arcade: Optional[ArcadeID] = None) -> List[Machine]:
         """
         Look up all machines on the network.
@@ -1,8 +1,9 @@
-from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
+from sqlalchemy import Table, Column, Index, UniqueConstraint, bindparam, func, select  # type: ignore
 from sqlalchemy.exc import IntegrityError  # type: ignore
-from sqlalchemy.types import String, Integer, JSON  # type: ignore
+from sqlalchemy.types import String, Integer, Text  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
-from typing import Optional, Dict, List, Tuple, Any
+from sqlalchemy.dialects.sqlite import insert  # type: ignore
+from typing import Optional, Dict, List, Sequence, Tuple, Any
 
 from ...common import Time
 from ..exceptions import ScoreSaveException
@@ -30,7 +31,7 @@ score = Table(
     Column('timestamp', Integer, nullable=False, index=True),
     Column('update', Integer, nullable=False, index=True),
     Column('lid', Integer, nullable=False, index=True),
-    Column('data', JSON, nullable=False),
+    Column('data', Text, nullable=False),
     UniqueConstraint('userid', 'musicid', name='userid_musicid'),
     mysql_charset='utf8mb4',
 )
@@ -51,11 +52,175 @@ score_history = Table(
     Column('timestamp', Integer, nullable=False, index=True),
     Column('lid', Integer, nullable=False, index=True),
     Column('new_record', Integer, nullable=False),
-    Column('data', JSON, nullable=False),
+    Column('data', Text, nullable=False),
     UniqueConstraint('userid', 'musicid', 'timestamp', name='userid_musicid_timestamp'),
+    Index('userid_game_musicid', 'userid', 'game', 'musicid'),
     mysql_charset='utf8mb4',
 )
 
+# Covers get_last_played, which wants a user's most recent attempts first.
+Index(
+    'userid_game_timestamp_musicid',
+    score_history.c.userid,
+    score_history.c.game,
+    score_history.c.timestamp.desc(),
+    score_history.c.musicid,
+)
+
+# Number of attempts a user has on the chart of the outer score row. Only used for
+# single score lookups, where it is evaluated exactly once.
+_SCORE_PLAYS = (
+    select(func.count(score_history.c.timestamp))
+    .where(
+        score_history.c.musicid == score.c.musicid,
+        score_history.c.userid == bindparam('userid'),
+        score_history.c.game == bindparam('game'),
+    )
+    .scalar_subquery()
+)
+
+_GET_SCORE_STMT = (
+    select(
+        score.c.id,
+        score.c.timestamp,
+        score.c['update'],
+        score.c.lid,
+        _SCORE_PLAYS,
+        score.c.points,
+        score.c.data,
+    )
+    .where(
+        score.c.userid == bindparam('userid'),
+        score.c.musicid == bindparam('musicid'),
+        score.c.game == bindparam('game'),
+    )
+)
+
+# Number of attempts a user has on each chart, counted in one grouped pass over their
+# history rather than once per score row.
+_PLAYS_BY_MUSICID = (
+    select(score_history.c.musicid, func.count(score_history.c.timestamp).label('plays'))
+    .where(
+        score_history.c.userid == bindparam('userid'),
+        score_history.c.game == bindparam('game'),
+    )
+    .group_by(score_history.c.musicid)
+    .subquery('history')
+)
+
+_GET_SCORES_STMT = (
+    select(
+        score.c.musicid,
+        score.c.id,
+        score.c.timestamp,
+        score.c['update'],
+        score.c.lid,
+        func.coalesce(_PLAYS_BY_MUSICID.c.plays, 0),
+        score.c.points,
+        score.c.data,
+    )
+    .select_from(score.outerjoin(_PLAYS_BY_MUSICID, _PLAYS_BY_MUSICID.c.musicid == score.c.musicid))
+    .where(
+        score.c.userid == bindparam('userid'),
+        score.c.game == bindparam('game'),
+    )
+)
+
+# Variants of the above, keyed by whether a since and/or until bound is given.
+_GET_SCORES_STMTS = {
+    (False, False): _GET_SCORES_STMT,
+    (True, False): _GET_SCORES_STMT.where(score.c['update'] >= bindparam('since')),
+    (False, True): _GET_SCORES_STMT.where(score.c['update'] < bindparam('until')),
+    (True, True): _GET_SCORES_STMT.where(
+        score.c['update'] >= bindparam('since'),
+        score.c['update'] < bindparam('until'),
+    ),
+}
+
+_MOST_PLAYED_PLAYS = func.count(score_history.c.timestamp).label('plays')
+_GET_MOST_PLAYED_STMT = (
+    select(score_history.c.musicid, _MOST_PLAYED_PLAYS)
+    .where(
+        score_history.c.userid == bindparam('userid'),
+        score_history.c.game == bindparam('game'),
+    )
+    .group_by(score_history.c.musicid)
+    .order_by(_MOST_PLAYED_PLAYS.desc())
+    .limit(bindparam('count'))
+)
+
+_GET_LAST_PLAYED_STMT = (
+    select(score_history.c.musicid, score_history.c.timestamp)
+    .distinct()
+    .where(
+        score_history.c.userid == bindparam('userid'),
+        score_history.c.game == bindparam('game'),
+    )
+    .order_by(score_history.c.timestamp.desc())
+    .limit(bindparam('count'))
+)
+
+_GET_ATTEMPT_BY_KEY_STMT = (
+    select(
+        score_history.c.musicid,
+        score_history.c.id,
+        score_history.c.timestamp,
+        score_history.c.userid,
+        score_history.c.lid,
+        score_history.c.new_record,
+        score_history.c.points,
+        score_history.c.data,
+    )
+    .where(
+        score_history.c.id == bindparam('scorekey'),
+        score_history.c.game == bindparam('game'),
+    )
+)
+
+_INSERT_ATTEMPT = insert(score_history).values(
+    userid=bindparam('userid'),
+    game=bindparam('game'),
+    musicid=bindparam('musicid'),
+    timestamp=bindparam('timestamp'),
+    lid=bindparam('location'),
+    new_record=bindparam('new_record'),
+    points=bindparam('points'),
+    data=bindparam('data'),
+)
+
+_UPSERT_SCORE = insert(score).values(
+    userid=bindparam('userid'),
+    game=bindparam('game'),
+    musicid=bindparam('musicid'),
+    points=bindparam('points'),
+    data=bindparam('data'),
+    timestamp=bindparam('timestamp'),
+    update=bindparam('update'),
+    lid=bindparam('location'),
+)
+
+# We want to update the timestamp/location to now if its a new record.
+_UPSERT_NEW_RECORD = _UPSERT_SCORE.on_conflict_do_update(
+    index_elements=['userid', 'musicid'],
+    set_={
+        'data': _UPSERT_SCORE.excluded.data,
+        'points': _UPSERT_SCORE.excluded.points,
+        'timestamp': _UPSERT_SCORE.excluded.timestamp,
+        'update': _UPSERT_SCORE.excluded['update'],
+        'lid': _UPSERT_SCORE.excluded.lid,
+    },
+)
+
+# We only want to add the timestamp if it is new.
+_UPSERT_POINTS_ONLY = _UPSERT_SCORE.on_conflict_do_update(
+    index_elements=['userid', 'musicid'],
+    set_={
+        'data': _UPSERT_SCORE.excluded.data,
+        'points': _UPSERT_SCORE.excluded.points,
+        'update': _UPSERT_SCORE.excluded['update'],
+    },
+)
+
 
 class MusicData(BaseData):
 
@@ -84,7 +249,19 @@ class MusicData(BaseData):
         Returns:
             Integer representing song ID if found or raises an exception otherwise.
         """
-        return int(musicid / 10000)
+        return musicid // 10000
+
+    def __get_version(self, musicid: int) -> int:
+        """
+        Given a musicid, look up the game version this song ID belongs to.
+
+        Parameters:
+            musicid - Mixed game/version/songid/chart by self.__get_musicid.
+
+        Returns:
+            Integer representing the game version.
+        """
+        return (musicid // 100) % 100
 
     def __get_songchart(self, musicid: int) -> int:
         """
@@ -96,7 +273,7 @@ class MusicData(BaseData):
         Returns:
             Integer representing song ID if found or raises an exception otherwise.
         """
-        return int(musicid % 100)
+        return musicid % 100
 
     async def put_score(
             self,
@@ -126,40 +303,89 @@ class MusicData(BaseData):
             new_record - Whether this score was a new record or not.
             timestamp - Optional integer specifying when the high score happened.
         """
-        # First look up the song/chart from the music DB
-        musicid = self.__get_musicid(game, version, songid, songchart)
-        ts = timestamp if timestamp is not None else Time.now()
-
         # Add to user score
-        if new_record:
-            # We want to update the timestamp/location to now if its a new record.
-            sql = (
-                    "INSERT INTO `score` (`userid`, `game`, `musicid`, `points`, `data`, `timestamp`, `update`, `lid`) " +
-                    "VALUES (:userid, :game, :musicid, :points, :data, :timestamp, :update, :location) " +
-                    "ON CONFLICT(userid, musicid) DO UPDATE SET data=excluded.data, points = excluded.points, " +
-                    "timestamp = excluded.timestamp, `update` = excluded.'update', lid = excluded.lid"
-            )
-        else:
-            # We only want to add the timestamp if it is new.
-            sql = (
-                    "INSERT INTO `score` (`userid`, `game`, `musicid`, `points`, `data`, `timestamp`, `update`, `lid`) " +
-                    "VALUES (:userid, :game, :musicid, :points, :data, :timestamp, :update, :location) " +
-                    "ON CONFLICT(userid, musicid) DO UPDATE SET data=excluded.data, points = excluded.points, `update` = excluded.'update'"
-            )
+        sql = _UPSERT_NEW_RECORD if new_record else _UPSERT_POINTS_ONLY
         await self.execute(
             sql,
-            {
-                'userid': userid,
-                'game': game,
-                'musicid': musicid,
-                'points': points,
-                'data': self.serialize(data),
-                'timestamp': ts,
-                'update': ts,
-                'location': location,
-            }
+            self.__score_params(game, version, userid, songid, songchart, location, points, data, timestamp),
         )
 
+    async def record_play(
+            self,
+            game: str,
+            version: int,
+            userid: UserID,
+            songid: int,
+            songchart: int,
+            location: int,
+            points: int,
+            data: Dict[str, Any],
+            highscore_points: int,
+            highscore_data: Dict[str, Any],
+            new_record: bool,
+            timestamp: Optional[int] = None,
+    ) -> None:
+        """
+        Given a game/version/song/chart and user ID, save both the attempt and the resulting high
+        score for a single play. This does the same thing as calling put_attempt and put_score,
+        but both writes are committed together in one transaction.
+
+        Parameters:
+            game - String representing a game series.
+            version - Integer representing which version of the game.
+            userid - Integer representing a user. Usually looked up with UserData.
+            songid - ID of the song according to the game.
+            songchart - Chart number according to the game.
+            location - Machine ID where this score was earned.
+            points - Points obtained on this attempt.
+            data - Data that the game wishes to record along with the attempt.
+            highscore_points - Points of the user's high score after this attempt.
+            highscore_data - Data that the game wishes to record along with the high score.
+            new_record - Whether this attempt was a new record or not.
+            timestamp - Optional integer specifying when the play happened.
+        """
+        ts = timestamp if timestamp is not None else Time.now()
+        attempt = self.__attempt_params(game, version, userid, songid, songchart, location, points, data, new_record, ts)
+        try:
+            await self.execute_batch([
+                (
+                    _UPSERT_NEW_RECORD if new_record else _UPSERT_POINTS_ONLY,
+                    self.__score_params(game, version, userid, songid, songchart, location, highscore_points, highscore_data, ts),
+                ),
+                (_INSERT_ATTEMPT, attempt),
+            ])
+        except IntegrityError:
+            raise ScoreSaveException(
+                f'There is already an attempt by {attempt["userid"]} for music id {attempt["musicid"]} at {attempt["timestamp"]}'
+            )
+
+    def __score_params(
+            self,
+            game: str,
+            version: int,
+            userid: UserID,
+            songid: int,
+            songchart: int,
+            location: int,
+            points: int,
+            data: Dict[str, Any],
+            timestamp: Optional[int],
+    ) -> Dict[str, Any]:
+        """
+        Given the parameters of put_score, build the parameters for upserting it into score.
+        """
+        ts = timestamp if timestamp is not None else Time.now()
+        return {
+            'userid': userid,
+            'game': game,
+            'musicid': self.__get_musicid(game, version, songid, songchart),
+            'points': points,
+            'data': self.serialize(data),
+            'timestamp': ts,
+            'update': ts,
+            'location': location,
+        }
+
     async def put_attempt(
             self,
             game: str,
@@ -191,33 +417,90 @@ class MusicData(BaseData):
             new_record - Whether this score was a new record or not.
             timestamp - Optional integer specifying when the attempt happened.
         """
-        # First look up the song/chart from the music DB
-        musicid = self.__get_musicid(game, version, songid, songchart)
-        ts = timestamp if timestamp is not None else Time.now()
-
-        # Add to score history
-        sql = (
-                "INSERT INTO `score_history` (userid, game, musicid, timestamp, lid, new_record, points, data) " +
-                "VALUES (:userid, :game, :musicid, :timestamp, :location, :new_record, :points, :data)"
-        )
+        params = self.__attempt_params(game, version, userid, songid, songchart, location, points, data, new_record, timestamp)
         try:
-            await self.execute(
-                sql,
-                {
-                    'userid': userid if userid is not None else 0,
-                    'game': game,
-                    'musicid': musicid,
-                    'timestamp': ts,
-                    'location': location,
-                    'new_record': 1 if new_record else 0,
-                    'points': points,
-                    'data': self.serialize(data),
-                },
-            )
+            await self.execute(_INSERT_ATTEMPT, params)
         except IntegrityError:
             raise ScoreSaveException(
-                f'There is already an attempt by {userid if userid is not None else 0} for music id {musicid} at {ts}'
+                f'There is already an attempt by {params["userid"]} for music id {params["musicid"]} at {params["timestamp"]}'
+            )
+
+    async def put_attempts_bulk(self, game: str, version: int, attempts: Sequence[Dict[str, Any]]) -> None:
+        """
+        Given a game/version and a list of attempts, save all of them with a single statement.
+
+        If any attempt collides with an existing one, the rest are still saved one at a time
+        and a ScoreSaveException is raised afterwards describing the collisions.
+
+        Parameters:
+            game - String representing a game series.
+            version - Integer representing which version of the game.
+            attempts - A list of dictionaries with the keys userid, songid, songchart, location,
+                       points, data, new_record and optionally timestamp. These mean the same
+                       thing as the identically named parameters to put_attempt.
+        """
+        if len(attempts) == 0:
+            return
+
+        now = Time.now()
+        rows = [
+            self.__attempt_params(
+                game,
+                version,
+                attempt['userid'],
+                attempt['songid'],
+                attempt['songchart'],
+                attempt['location'],
+                attempt['points'],
+                attempt['data'],
+                attempt['new_record'],
+                attempt.get('timestamp', now),
             )
+            for attempt in attempts
+        ]
+        try:
+            # Run as a batch so that a collision rolls back any rows inserted before it.
+            await self.execute_batch([(_INSERT_ATTEMPT, rows)])
+            return
+        except IntegrityError:
+            # Nothing from the batch was saved, so figure out which rows are the problem.
+            pass
+
+        failures = []
+        for params in rows:
+            try:
+                await self.execute(_INSERT_ATTEMPT, params)
+            except IntegrityError:
+                failures.append(f'{params["userid"]} for music id {params["musicid"]} at {params["timestamp"]}')
+        if len(failures) > 0:
+            raise ScoreSaveException(f'There is already an attempt by {", ".join(failures)}')
+
+    def __attempt_params(
+            self,
+            game: str,
+            version: int,
+            userid: Optional[UserID],
+            songid: int,
+            songchart: int,
+            location: int,
+            points: int,
+            data: Dict[str, Any],
+            new_record: bool,
+            timestamp: Optional[int],
+    ) -> Dict[str, Any]:
+        """
+        Given the parameters of put_attempt, build the parameters for inserting it into score_history.
+        """
+        return {
+            'userid': userid if userid is not None else 0,
+            'game': game,
+            'musicid': self.__get_musicid(game, version, songid, songchart),
+            'timestamp': timestamp if timestamp is not None else Time.now(),
+            'location': location,
+            'new_record': 1 if new_record else 0,
+            'points': points,
+            'data': self.serialize(data),
+        }
 
     async def get_score(self, game: str, version: int, userid: UserID, songid: int, songchart: int) -> Optional[Score]:
         """
@@ -234,13 +517,8 @@ class MusicData(BaseData):
             The optional data stored by the game previously, or None if no score exists.
         """
         musicid = self.__get_musicid(game, version, songid, songchart)
-        sql = (
-                "SELECT score.id AS scorekey, score.timestamp AS timestamp, 'score.update' AS 'update', score.lid AS lid, " +
-                "(select COUNT(score_history.timestamp) FROM score_history WHERE score_history.musicid = :musicid AND score_history.userid = :userid AND score_history.game = :game) AS plays, " +
-                "score.points AS points, score.data AS data FROM score WHERE score.userid = :userid AND score.musicid = :musicid AND score.game = :game"
-        )
         cursor = await self.execute(
-            sql,
+            _GET_SCORE_STMT,
             {
                 'userid': userid,
                 'game': game,
@@ -254,16 +532,17 @@ class MusicData(BaseData):
             # score doesn't exist
             return None
 
+        (scorekey, timestamp, update, lid, plays, points, data) = result
         return Score(
-            result['scorekey'],
+            scorekey,
             songid,
             songchart,
-            result['points'],
-            result['timestamp'],
-            result['update'],
-            result['lid'],
-            result['plays'],
-            self.deserialize(result['data']),
+            points,
+            timestamp,
+            update,
+            lid,
+            plays,
+            self.deserialize(data),
         )
 
     async def get_scores(
@@ -285,36 +564,29 @@ class MusicData(BaseData):
         Returns:
             A list of Score objects representing all high scores for a game.
         """
-        sql = (
-            "SELECT score.musicid AS musicid, score.id AS scorekey, score.timestamp AS timestamp, 'score.update' AS `update`, score.lid AS lid, " +
-            "(select COUNT(score_history.timestamp) FROM score_history WHERE score_history.musicid = score.musicid AND score_history.userid = :userid AND score_history.game = :game) AS plays, " +
-            "score.points AS points, score.data AS data FROM score WHERE score.userid = :userid AND score.game = :game"
-        )
+        params: Dict[str, Any] = {'userid': userid, 'game': game}
         if since is not None:
-            sql = sql + ' AND score.update >= :since'
+            params['since'] = since
         if until is not None:
-            sql = sql + ' AND score.update < :until'
-        cursor = await self.execute(sql, {'userid': userid, 'game': game, 'version': version, 'since': since, 'until': until})
-
-        scores = []
-        for result in cursor.fetchall():
-            songid = self.__get_songid(result['musicid'])
-            songchart = self.__get_songchart(result['musicid'])
-            scores.append(
-                Score(
-                    result['scorekey'],
-                    songid,
-                    songchart,
-                    result['points'],
-                    result['timestamp'],
-                    result['update'],
-                    result['lid'],
-                    result['plays'],
-                    self.deserialize(result['data']),
-                )
+            params['until'] = until
+        cursor = await self.execute(_GET_SCORES_STMTS[(since is not None, until is not None)], params)
+
+        # Song ID and chart are unpacked inline, see __get_musicid for the layout.
+        deserialize = self.deserialize
+        return [
+            Score(
+                scorekey,
+                musicid // 10000,
+                musicid % 100,
+                points,
+                timestamp,
+                update,
+                lid,
+                plays,
+                deserialize(data),
             )
-
-        return scores
+            for (musicid, scorekey, timestamp, update, lid, plays, points, data) in cursor
+        ]
 
     async def get_most_played(self, game: str, version: int, userid: UserID, count: int) -> List[Tuple[int, int]]:
         """
@@ -329,21 +601,9 @@ class MusicData(BaseData):
         Returns:
             A list of tuples, containing the songid and the number of plays across all charts for that song.
         """
-        sql = (
-                "SELECT score_history.musicid AS musicid, COUNT(score_history.timestamp) AS plays FROM score_history " +
-                "WHERE score_history.userid = :userid AND score_history.game = :game " +
-                "GROUP BY musicid ORDER BY plays DESC LIMIT :count"
-        )
-        cursor = await self.execute(sql, {'userid': userid, 'game': game, 'version': version, 'count': count})
-
-        most_played = []
-        for result in cursor.fetchall():
-            songid = self.__get_songid(result['musicid'])
-            most_played.append(
-                (songid, result['plays'])
-            )
+        cursor = await self.execute(_GET_MOST_PLAYED_STMT, {'userid': userid, 'game': game, 'count': count})
 
-        return most_played
+        return [(musicid // 10000, plays) for (musicid, plays) in cursor]
 
     async def get_last_played(self, game: str, version: int, userid: UserID, count: int) -> List[Tuple[int, int]]:
         """
@@ -358,26 +618,13 @@ class MusicData(BaseData):
         Returns:
             A list of tuples, containing the songid and the last played time for this song.
         """
-        sql = (
-                "SELECT DISTINCT(score_history.musicid) AS musicid, score_history.timestamp AS timestamp FROM score_history " +
-                "WHERE score_history.userid = :userid AND score_history.game = :game " +
-                "ORDER BY timestamp DESC LIMIT :count"
-        )
-        cursor = await self.execute(sql, {'userid': userid, 'game': game, 'version': version, 'count': count})
+        cursor = await self.execute(_GET_LAST_PLAYED_STMT, {'userid': userid, 'game': game, 'count': count})
 
-        last_played = []
-        for result in cursor.fetchall():
-            songid = self.__get_songid(result['musicid'])
-            last_played.append(
-                (songid, result['timestamp'])
-            )
-
-        return last_played
+        return [(musicid // 10000, timestamp) for (musicid, timestamp) in cursor]
 
     async def get_attempt_by_key(self, game: str, version: int, key: int) -> Optional[Tuple[UserID, Attempt]]:
         """
         Look up a previous attempt by key.
-        TODO
 
         Parameters:
             game - String representing a game series.
@@ -387,16 +634,10 @@ class MusicData(BaseData):
         Returns:
             The optional data stored by the game previously, or None if no score exists.
         """
-        sql = (
-                "SELECT music.songid AS songid, music.chart AS chart, score_history.id AS scorekey, score_history.timestamp AS timestamp, score_history.userid AS userid, " +
-                "score_history.lid AS lid, score_history.new_record AS new_record, score_history.points AS points, score_history.data AS data FROM score_history, music " +
-                "WHERE score_history.id = :scorekey AND score_history.musicid = music.id AND music.game = :game AND music.version = :version"
-        )
         cursor = await self.execute(
-            sql,
+            _GET_ATTEMPT_BY_KEY_STMT,
             {
                 'game': game,
-                'version': version,
                 'scorekey': key,
             },
         )
@@ -407,16 +648,21 @@ class MusicData(BaseData):
             # score doesn't exist
             return None
 
+        (musicid, scorekey, timestamp, userid, lid, new_record, points, data) = result
+        if self.__get_version(musicid) != version:
+            # Attempt exists, but for another version of this game
+            return None
+
         return (
-            UserID(result['userid']),
+            UserID(userid),
             Attempt(
-                result['scorekey'],
-                result['songid'],
-                result['chart'],
-                result['points'],
-                result['timestamp'],
-                result['lid'],
-                True if result['new_record'] == 1 else False,
-                self.deserialize(result['data']),
+                scorekey,
+                self.__get_songid(musicid),
+                self.__get_songchart(musicid),
+                points,
+                timestamp,
+                lid,
+                True if new_record == 1 else False,
+                self.deserialize(data),
             )
-        )
\ No newline at end of file
+        )
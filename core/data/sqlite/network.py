@@ -1,7 +1,7 @@
 from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.types import String, Integer, Text, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, List, Sequence, Tuple, Any
 
 from ...common import Time
 from .base import BaseData, metadata
@@ -155,6 +155,36 @@ class NetworkData(BaseData):
         sql = "INSERT INTO audit (timestamp, userid, arcadeid, type, data) VALUES (:ts, :uid, :aid, :type, :data)"
         await self.execute(sql, {'ts': timestamp, 'type': event, 'data': self.serialize(data), 'uid': userid, 'aid': arcadeid})
 
+    async def put_events_bulk(
+            self,
+            events: Sequence[Tuple[str, Dict[str, Any]]],
+            timestamp: Optional[int] = None,
+            timestamps: Optional[Sequence[Optional[int]]] = None,
+    ) -> None:
+        """
+        Given a list of event type and data pairs, insert all of them with one statement.
+
+        Parameters:
+            events - A list of tuples containing the event type and a dictionary of values.
+            timestamp - Optional timestamp to record for every event, defaults to now.
+            timestamps - Optional list of timestamps, one for each event. Events whose
+                         timestamp is None get the timestamp above instead.
+        """
+        if len(events) == 0:
+            return
+        if timestamp is None:
+            timestamp = Time.now()
+        if timestamps is None:
+            timestamps = [None] * len(events)
+        sql = "INSERT INTO audit (timestamp, userid, arcadeid, type, data) VALUES (:ts, :uid, :aid, :type, :data)"
+        await self.execute(
+            sql,
+            [
+                {'ts': ts if ts is not None else timestamp, 'type': event, 'data': self.serialize(data), 'uid': None, 'aid': None}
+                for ((event, data), ts) in zip(events, timestamps)
+            ],
+        )
+
     async def get_events(
             self,
             userid: Optional[UserID] = None,
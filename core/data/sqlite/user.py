@@ -380,10 +380,10 @@ class UserData(BaseData):
         else:
             return None
 
-    async def get_any_profiles(self, game: str, version: int, userids: List[UserID]) -> List[Tuple[UserID, Optional[ValidatedDict]]]:
+    async def get_any_profiles(self, game: str, version: int, userids: List[UserID]) -> Dict[UserID, Optional[ValidatedDict]]:
         """
         Does the exact same thing as get_any_profile but across a list of users instead of one.
-        Provided purely as a convenience function.
+        All users are looked up with a single query.
 
         Parameters:
             game - String identifier of the game looking up the user.
@@ -391,13 +391,54 @@ class UserData(BaseData):
             userids - List of Integer user IDs, as looked up by one of the above functions.
 
         Returns:
-            A List of tuples containing a userid and a dictionary previously stored by a game class if found,
-            or None otherwise.
+            A dictionary keyed by userid, containing a dictionary previously stored by a game class
+            if found, or None otherwise. Every requested userid is present.
         """
-        return [
-            (userid, await self.get_any_profile(game, version, userid))
-            for userid in userids
-        ]
+        userids = list(dict.fromkeys(userids))
+        if len(userids) == 0:
+            return {}
+
+        params: Dict[str, Any] = {'game': game}
+        for i, userid in enumerate(userids):
+            params[f'u{i}'] = userid
+        placeholders = ', '.join(f':u{i}' for i in range(len(userids)))
+        sql = (
+            "SELECT refid.userid AS userid, refid.version AS version, refid.refid AS refid, "
+            "extid.extid AS extid, profile.data AS data "
+            "FROM refid "
+            "LEFT JOIN extid ON extid.userid = refid.userid AND extid.game = refid.game "
+            "LEFT JOIN profile ON profile.refid = refid.refid "
+            f"WHERE refid.game = :game AND refid.userid IN ({placeholders})"
+        )
+        cursor = await self.execute(sql, params)
+
+        # Pick the same version get_any_profile would, the requested one if played,
+        # otherwise the newest version this user has played.
+        chosen: Dict[UserID, Any] = {}
+        for result in cursor.fetchall():
+            userid = UserID(result['userid'])
+            current = chosen.get(userid)
+            if current is None or (
+                current['version'] != version and
+                (result['version'] == version or result['version'] > current['version'])
+            ):
+                chosen[userid] = result
+
+        profiles: Dict[UserID, Optional[ValidatedDict]] = {}
+        for userid in userids:
+            result = chosen.get(userid)
+            if result is None or result['extid'] is None or result['data'] is None:
+                profiles[userid] = None
+                continue
+            profile = {
+                'refid': result['refid'],
+                'extid': result['extid'],
+                'game': game,
+                'version': result['version'],
+            }
+            profile.update(self.deserialize(result['data']))
+            profiles[userid] = ValidatedDict(profile)
+        return profiles
 
     async def get_games_played(self, userid: UserID) -> List[Tuple[str, int]]:
         """
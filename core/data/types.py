@@ -206,6 +206,9 @@ class Score:
     An object representing a single score for a user.
     """
 
+    # Score lookups can return thousands of these at once, so skip the per-instance dict.
+    __slots__ = ('key', 'id', 'chart', 'points', 'timestamp', 'update', 'location', 'plays', 'data')
+
     def __init__(
         self,
         key: int,
@@ -251,6 +254,8 @@ class Attempt:
     An object representing a single score attempt for a user.
     """
 
+    __slots__ = ('key', 'id', 'chart', 'points', 'timestamp', 'location', 'new_record', 'data')
+
     def __init__(
         self,
         key: int,
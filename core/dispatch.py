@@ -1,5 +1,6 @@
-import copy
-from typing import Optional, Dict, Any
+from collections import ChainMap
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
 from .base import Model, Base, Status
 from .protocol import Node
@@ -13,6 +14,34 @@ class UnrecognizedPCBIDException(Exception):
         self.ip = ip
 
 
+@lru_cache(maxsize=4096)
+def _handler_names(service: str, method: Optional[str]) -> Tuple[str, str]:
+    """
+    Given a service and method, return the names of the handle_<service>_<method>_request
+    and handle_<service>_request functions, so we don't format them for every packet.
+    Service and method names come from the client, so the cache is bounded in case of garbage.
+    """
+    return (f'handle_{service}_{method}_request', f'handle_{service}_request')
+
+
+@lru_cache(maxsize=256)
+def _parse_modelstring(modelstring: str) -> Tuple[str, str, str, str, Optional[int]]:
+    """
+    Parse a modelstring into its fields, reusing the result for modelstrings we've seen
+    before. Each cabinet sends the same modelstring with every packet.
+    """
+    model = Model.from_modelstring(modelstring)
+    return (model.game, model.dest, model.spec, model.rev, model.version)
+
+
+def _parse_model(modelstring: str) -> Model:
+    """
+    Parse a modelstring into a Model. The Model is new for every call, since games
+    are free to modify the one they're given.
+    """
+    return Model(*_parse_modelstring(modelstring))
+
+
 class Dispatch:
     """
     Dispatch object responsible for taking a decoded tree of Node objects
@@ -72,55 +101,63 @@ class Dispatch:
             return None
 
         modelstring = tree.attribute('model')
-        model = Model.from_modelstring(modelstring)
+        model = _parse_model(modelstring)
         pcbid = tree.attribute('srcid')
 
-        pcb = await self.__data.local.machine.get_machine(pcbid)
+        # Look up the machine and its arcade together, since we need both
+        pcb_and_arcade = await self.__data.local.machine.get_machine_with_arcade(pcbid)
 
-        # If we don't have a Machine, but we aren't enforcing, we must create it
-        if pcb is None:
+        if pcb_and_arcade is None:
+            # If we don't have a Machine, but we aren't enforcing, we must create it
             pcb = await self.__data.local.machine.create_machine(pcbid)
+            arcade = None
+        else:
+            pcb, arcade = pcb_and_arcade
 
         request = tree.children[0]
 
-        config = copy.copy(self.__config)
-        config['machine'] = {
-            'pcbid': pcbid,
-            'arcade': pcb.arcade,
+        # Per-request settings go in an overlay on top of the shared config, which
+        # must never be modified here since every request sees the same one.
+        overlay: Dict[str, Any] = {
+            'machine': {
+                'pcbid': pcbid,
+                'arcade': pcb.arcade,
+            },
         }
 
         # If the machine we looked up is in an arcade, override the global
         # paseli settings with the arcade paseli settings.
-        if pcb.arcade is not None:
-            arcade = await self.__data.local.machine.get_arcade(pcb.arcade)
-            if arcade is not None:
-                config['paseli']['enabled'] = arcade.data.get_bool('paseli_enabled')
-                config['paseli']['infinite'] = arcade.data.get_bool('paseli_infinite')
+        if arcade is not None:
+            overlay['paseli'] = {
+                **self.__config.get('paseli', {}),
+                'enabled': arcade.data.get_bool('paseli_enabled'),
+                'infinite': arcade.data.get_bool('paseli_infinite'),
+            }
+
+        config = ChainMap(overlay, self.__config)
 
         game = Base.create(self.__data, config, model)
+        if game is not None:
+            # We just loaded this machine, so don't make the game load it again.
+            game.set_machine(pcb)
         method = request.attribute('method')
         response = None
+        specific, generic = _handler_names(request.name, method)
 
         # First, try to handle with specific service/method function
-        try:
-            handler = getattr(game, f'handle_{request.name}_{method}_request')
-        except AttributeError:
-            handler = None
+        handler = getattr(game, specific, None)
         if handler is not None:
             response = await handler(request)
 
         if response is None:
             # Now, try to pass it off to a generic service handler
-            try:
-                handler = getattr(game, f'handle_{request.name}_request')
-            except AttributeError:
-                handler = None
+            handler = getattr(game, generic, None)
             if handler is not None:
                 response = await handler(request)
 
         if response is None:
             # Unrecognized handler
-            self.log(f"Unrecognized service {request.name} method {method}")
+            self.log("Unrecognized service {} method {}", request.name, method)
             return None
 
         # Make sure we have a status value if one wasn't provided
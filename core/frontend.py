@@ -1,109 +1,201 @@
-import yaml
-import copy
-import traceback
+import asyncio
 import os
+import re
+import sys
 import importlib
 
-from typing import Any, Dict
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from fastapi import FastAPI, Response, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.logger import logger
+from jinja2 import Template
 
 from .data.data import Data
+from .config import ServerConfig, load_yaml
 from . import root_temp, root_exe
 from settings import Settings
 
-app = FastAPI()
+# Prefer orjson, it is several times faster than the stdlib json module.
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    A JSONResponse that encodes its content with orjson when it is installed,
+    falling back to the stdlib encoder otherwise.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+
+class PluginStaticFiles(StaticFiles):
+    """
+    Serves every plugin's static directory from a single mount, using the first part
+    of the path to pick the plugin. This way the router only has one mount to check
+    no matter how many plugins register static files.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(check_dir=False)
+        self.__plugins: Dict[str, StaticFiles] = {}
+
+    def add_directory(self, plugin: str, directory: str) -> None:
+        """
+        Serve a plugin's static files from a directory.
+
+        Parameters:
+            plugin - Name of the plugin, which is the first part of the path.
+            directory - Directory to serve the plugin's files from.
+        """
+        self.__plugins[plugin] = StaticFiles(directory=directory)
+
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        plugin, _, rest = path.partition(os.sep)
+        files = self.__plugins.get(plugin)
+        if files is None or not rest:
+            return '', None
+        return files.lookup_path(rest)
+
+
+app = FastAPI(default_response_class=OrjsonResponse)
+pluginStatic = PluginStaticFiles()
+app.mount("/static/plugin", pluginStatic)
 config: Dict[str, Any] = {}
+server_config: Optional[ServerConfig] = None
 
 templates = Jinja2Templates(os.path.join(root_temp, "core", "templates"))
 
+# Our own pages never change while running, so look their templates up once rather
+# than going through TemplateResponse, which checks whether they changed every time.
+templateCache: Dict[str, Template] = {}
+
+
+def get_template(name: str) -> Template:
+    """
+    Look up one of our own templates, loading it on first use.
+
+    Parameters:
+        name - Filename of the template in the core templates directory.
+
+    Returns:
+        The loaded Jinja2 template.
+    """
+    global templateCache
+
+    template = templateCache.get(name)
+    if template is None:
+        template = templates.env.get_template(name)
+        templateCache[name] = template
+    return template
+
 menuMap = {}
-webuiMap = {}
+# Plugin name to webui module, or None if the module hasn't been imported yet.
+webuiMap: Dict[str, Optional[ModuleType]] = {}
+webuiLocks: Dict[str, asyncio.Lock] = {}
+# (plugin, method, verb) to the webui handler for it, see register_handlers.
+webuiDispatch: Dict[Tuple[str, str, str], Callable[[Request, Data], Awaitable[Any]]] = {}
 
 
-@app.get('/', response_class=HTMLResponse)
+@app.get('/', response_class=HTMLResponse, response_model=None, include_in_schema=False)
 async def main(request: Request) -> Response:
     global menuMap
 
-    return templates.TemplateResponse("base.html",
-                                      {"request": request,
-                                       'appname': config['settings'].appname,
-                                       'version': config['settings'].version,
-                                       'menuMap': menuMap,
-                                       'url': '/index'})
+    return HTMLResponse(get_template("base.html").render({
+        'request': request,
+        'appname': config['settings'].appname,
+        'version': config['settings'].version,
+        'menuMap': menuMap,
+        'url': '/index',
+    }))
 
 
-@app.get('/index', response_class=HTMLResponse)
+@app.get('/index', response_class=HTMLResponse, response_model=None, include_in_schema=False)
 async def index(request: Request) -> Response:
-    return templates.TemplateResponse("index.html",
-                                      {"request": request,
-                                       "request": request,
-                                       'appname': config['settings'].appname,
-                                       'version': config['settings'].version,
-                                       'host': config['server']['host'],
-                                       'backend_port': config['server']['backend_port'],
-                                       'frontend_port': config['server']['frontend_port']})
-
-
-@app.get('/plugin/{plugin}/{method}', response_class=HTMLResponse)
-@app.post('/plugin/{plugin}/{method}')
+    return HTMLResponse(get_template("index.html").render({
+        'request': request,
+        'appname': config['settings'].appname,
+        'version': config['settings'].version,
+        'host': server_config.host,
+        'backend_port': server_config.backend_port,
+        'frontend_port': server_config.frontend_port,
+    }))
+
+
+@app.get('/plugin/{plugin}/{method}', response_class=HTMLResponse, response_model=None, include_in_schema=False)
+@app.post('/plugin/{plugin}/{method}', response_model=None, include_in_schema=False)
 async def plugin_handler(plugin: str, method: str, request: Request) -> Response:
     global webuiMap
 
-    webui = webuiMap[plugin]
+    if webuiMap[plugin] is None:
+        await import_webui(plugin)
 
-    try:
-        if request.method == "GET":
-            handler = getattr(webui, f'handle_{plugin}_{method}_get')
-        elif request.method == "POST":
-            handler = getattr(webui, f'handle_{plugin}_{method}_post')
-        elif request.method == "PUT":
-            handler = getattr(webui, f'handle_{plugin}_{method}_put')
-        else:
-            handler = None
-    except AttributeError:
-        handler = None
+    handler = webuiDispatch.get((plugin, method, request.method.lower()))
 
     if handler is not None:
-        # Create and format config
-        requestconfig = copy.copy(config)
-        requestconfig['client'] = {
-            'address': request.client.host,
-        }
+        # Per-request settings go in an overlay on top of the shared config, so that
+        # we don't have to copy it for every request.
+        requestconfig = ChainMap(
+            {
+                'client': {
+                    'address': request.client.host,
+                },
+            },
+            config,
+        )
 
         dataprovider = Data(requestconfig)
-        return await handler(request, dataprovider)
+        try:
+            response = await handler(request, dataprovider)
+        finally:
+            # Hand the connection back to the pool rather than waiting for GC to do it.
+            await dataprovider.close()
+        if not isinstance(response, Response):
+            # Handlers can return plain data and let us encode it.
+            response = OrjsonResponse(response)
+        return response
 
     return Response("No handler found for request.")
 
 
-@app.get('/{plugin}/{method}', response_class=HTMLResponse)
+@app.get('/{plugin}/{method}', response_class=HTMLResponse, response_model=None, include_in_schema=False)
 async def plugin_webui(plugin: str, method: str, request: Request) -> Response:
     global menuMap
 
-    return templates.TemplateResponse("base.html",
-                                      {"request": request,
-                                       'appname': config['settings'].appname,
-                                       'version': config['settings'].version,
-                                       'menuMap': menuMap,
-                                       'url': '/plugin/%s/%s' % (plugin, method)})
+    return HTMLResponse(get_template("base.html").render({
+        'request': request,
+        'appname': config['settings'].appname,
+        'version': config['settings'].version,
+        'menuMap': menuMap,
+        'url': '/plugin/%s/%s' % (plugin, method),
+    }))
 
 
 def load_config(filename: str) -> None:
     global config
+    global server_config
 
-    config.update(yaml.safe_load(open(filename)))
+    config.update(load_yaml(filename))
     config['database']['engine'] = Data.create_engine(config)
     config['settings'] = Settings()
+    server_config = ServerConfig.from_config(config)
 
 
 def add_menu(href, title):
     global menuMap
 
-    plugin_name = traceback.extract_stack()[-2][0].split('\\')[-2].upper()
+    # The caller is always a plugin's webui module, so its directory is the plugin name.
+    plugin_name = os.path.basename(os.path.dirname(sys._getframe(1).f_code.co_filename)).upper()
 
     if plugin_name not in menuMap:
         menuMap[plugin_name] = []
@@ -115,40 +207,100 @@ def add_menu(href, title):
 
 
 def add_static(directory):
-    plugin_name = traceback.extract_stack()[-2][0].split('\\')[-2]
-    app.mount("/static/plugin/" + plugin_name, StaticFiles(directory=directory))
+    plugin_name = os.path.basename(os.path.dirname(sys._getframe(1).f_code.co_filename))
+    pluginStatic.add_directory(plugin_name, directory)
 
 
-def register_plugins(plugins_root: str) -> None:
+async def import_webui(plugin: str) -> ModuleType:
+    """
+    Import a plugin's webui module the first time it is requested. The import happens
+    off the event loop, and concurrent requests for the same plugin wait on one import.
+    """
     global webuiMap
 
-    plugins_list = os.listdir('plugins')
+    lock = webuiLocks.setdefault(plugin, asyncio.Lock())
+    async with lock:
+        webui = webuiMap[plugin]
+        if webui is None:
+            webui = await asyncio.get_running_loop().run_in_executor(
+                None,
+                importlib.import_module,
+                "plugins.%s.webui" % plugin,
+            )
+            register_handlers(plugin, webui)
+            webuiMap[plugin] = webui
+            logger.info('Plugin:%s webui loaded.' % plugin)
+    return webui
+
+
+def register_handlers(plugin: str, webui: ModuleType) -> None:
+    """
+    Add every handle_<plugin>_<method>_<verb> function in a plugin's webui module to
+    the dispatch table, so requests don't have to build and look up the name each time.
+    """
+    global webuiDispatch
+
+    pattern = re.compile(r'^handle_%s_(.+)_(get|post|put)$' % re.escape(plugin))
+    for name in dir(webui):
+        match = pattern.match(name)
+        if match is not None:
+            webuiDispatch[(plugin, match.group(1), match.group(2))] = getattr(webui, name)
 
-    for plugin in plugins_list:
-        plugin_root = os.path.join(plugins_root, plugin)
-        if os.path.isdir(plugin_root):
-            game_factory_filepath = os.path.join(plugin_root, "webui.py")
-            if os.path.exists(game_factory_filepath):
-                webui = importlib.import_module("plugins.%s.webui" % plugin)
-                logger.info('Plugin:%s webui found.' % plugin)
 
-                try:
-                    menu_handler = getattr(webui, 'menu_handler')
-                    menu_handler(add_menu)
-                except:
-                    logger.info('Plugin %s does not have webui menu handler.' % plugin)
+def register_plugins(plugins_root: str) -> None:
+    global webuiMap
+
+    # Find every plugin with a webui, along with the module that has its hooks.
+    plugins: List[Tuple[str, str]] = []
+    with os.scandir(plugins_root) as entries:
+        for entry in entries:
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "webui.py")):
+                logger.info('Plugin:%s webui found.' % entry.name)
+
+                # Plugins can put their menu and static handlers in a small webui_meta
+                # module, in which case the webui module itself is only imported once
+                # somebody actually uses it. Otherwise we need the webui module now.
+                if os.path.exists(os.path.join(entry.path, "webui_meta.py")):
+                    plugins.append((entry.name, "plugins.%s.webui_meta" % entry.name))
+                else:
+                    plugins.append((entry.name, "plugins.%s.webui" % entry.name))
+
+    plugins.sort()
+
+    # Imports are mostly reading and compiling files, so do them concurrently. The hooks
+    # below still run one at a time on this thread, in order of plugin name.
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        modules = list(executor.map(importlib.import_module, [name for _, name in plugins]))
+
+    for (plugin, name), hooks in zip(plugins, modules):
+        menu_handler = getattr(hooks, 'menu_handler', None)
+        if menu_handler is not None:
+            menu_handler(add_menu)
+        else:
+            logger.debug('Plugin %s does not have webui menu handler.', plugin)
 
-                try:
-                    static_handler = getattr(webui, 'static_handler')
-                    static_handler(add_static)
-                except:
-                    logger.info('Plugin %s does not have webui static handler.' % plugin)
+        static_handler = getattr(hooks, 'static_handler', None)
+        if static_handler is not None:
+            static_handler(add_static)
+        else:
+            logger.debug('Plugin %s does not have webui static handler.', plugin)
 
-                webuiMap[plugin] = webui
-                logger.info('Plugin:%s webui loaded.' % plugin)
+        if name.endswith('.webui'):
+            register_handlers(plugin, hooks)
+            webuiMap[plugin] = hooks
+            logger.info('Plugin:%s webui loaded.' % plugin)
+        else:
+            webuiMap[plugin] = None
 
 
 @app.on_event("startup")
 async def startup_event():
     load_config(os.path.join(root_exe, "config.yaml"))
     register_plugins(os.path.join(root_exe, "plugins"))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Pooled connections keep their worker threads alive, which would stop the
+    # process from exiting.
+    await config['database']['engine'].dispose()
@@ -11,6 +11,8 @@ class CardManagerHandler(Base):
     class so that it can understand if there's a profile for a game or not.
     """
 
+    __slots__ = ()
+
     async def handle_cardmng_request(self, request: Node) -> Optional[Node]:
         """
         Handle a request for card management. This is independent of a game's profile handling,
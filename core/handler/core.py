@@ -1,60 +1,147 @@
+import asyncio
 import socket
+import time
+from typing import Dict, List, Set, Tuple
+from typing_extensions import Final
 
 from ..base import Base
 from ..protocol import Node
 from ..common import ID
 
+# How often, in seconds, to look the keepalive host up again in case it moved.
+KEEPALIVE_REFRESH: Final[int] = 300
+
+# Resolved keepalive IP and when it was resolved for each configured host, so we
+# don't do a DNS lookup per request.
+_KEEPALIVE_IPS: Dict[str, Tuple[str, float]] = {}
+_KEEPALIVE_REFRESHING: Set[str] = set()
+# Running refresh tasks. The event loop only keeps weak references to tasks, so hold on
+# to them here until they finish.
+_KEEPALIVE_TASKS: "Set[asyncio.Future[None]]" = set()
+
+# Item nodes for services.get keyed by everything that goes into them. These are the
+# same for every cabinet of a given game, so there's no reason to rebuild them per request.
+_SERVICES_ITEMS: Dict[Tuple[str, int, Tuple[str, ...], str], List[Node]] = {}
+
+# The parts of a facility.get response that don't depend on the machine, keyed by
+# the title we show in the URL fields.
+_FACILITY_STATIC: Dict[str, Tuple[Node, Node, Node]] = {}
+
+
+async def _resolve_keepalive(host: str) -> str:
+    """
+    Translate a host to a raw IP, because we can't give out a host for keepalive.
+    This goes through the event loop's resolver so that it doesn't block other requests.
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET)
+    ip = infos[0][4][0]
+    _KEEPALIVE_IPS[host] = (ip, time.monotonic())
+    return ip
+
+
+async def _refresh_keepalive(host: str) -> None:
+    try:
+        await _resolve_keepalive(host)
+    except Exception:
+        # Keep handing out the last IP we resolved, and don't try again until the
+        # next refresh is due.
+        cached = _KEEPALIVE_IPS.get(host)
+        if cached is not None:
+            _KEEPALIVE_IPS[host] = (cached[0], time.monotonic())
+    finally:
+        _KEEPALIVE_REFRESHING.discard(host)
+
+
+async def _keepalive_ip(host: str) -> str:
+    """
+    Return the IP for the keepalive host. Only the very first lookup waits on DNS, after
+    that a stale IP is returned while it is refreshed in the background.
+    """
+    cached = _KEEPALIVE_IPS.get(host)
+    if cached is None:
+        return await _resolve_keepalive(host)
+
+    ip, resolved = cached
+    if time.monotonic() - resolved > KEEPALIVE_REFRESH and host not in _KEEPALIVE_REFRESHING:
+        _KEEPALIVE_REFRESHING.add(host)
+        task = asyncio.ensure_future(_refresh_keepalive(host))
+        _KEEPALIVE_TASKS.add(task)
+        task.add_done_callback(_KEEPALIVE_TASKS.discard)
+    return ip
+
+
 
 class CoreHandler(Base):
     """
     Implements the core packets that are shared across all games.
     """
 
+    __slots__ = ()
+
     async def handle_services_get_request(self, request: Node) -> Node:
         """
         Handles a game request for services.get. This should return the URL of
         each server which handles a particular service. For us, this is always
         our URL since we serve everything.
         """
+        host = self.config['server']['host']
+        port = self.config['server']['backend_port']
 
-        def item(name: str, url: str) -> Node:
-            node = Node.void('item')
-            node.set_attribute('name', name)
-            node.set_attribute('url', url)
-            return node
+        keepalive = await _keepalive_ip(host)
+
+        key = (host, port, tuple(self.extra_services()), keepalive)
+        items = _SERVICES_ITEMS.get(key)
+        if items is None:
+            items = CoreHandler.__services_items(*key)
+            _SERVICES_ITEMS[key] = items
 
-        url = f'http://{self.config["server"]["host"]}:{self.config["server"]["backend_port"]}/'
         root = Node.void('services')
         root.set_attribute('expire', '600')
         # This can be set to 'operation', 'debug', 'test', and 'factory'.
         root.set_attribute('mode', 'operation')
         root.set_attribute('product_domain', '1')
+        for item in items:
+            root.add_child(item)
+        return root
+
+    @staticmethod
+    def __services_items(host: str, port: int, extra_services: Tuple[str, ...], keepalive: str) -> List[Node]:
+        """
+        Build the item nodes for a services.get response. These are never modified once
+        built, so they can be shared between responses.
+        """
+
+        def item(name: str, url: str) -> Node:
+            node = Node.void('item')
+            node.set_attribute('name', name)
+            node.set_attribute('url', url)
+            return node
 
-        root.add_child(item('cardmng', url))
-        root.add_child(item('dlstatus', url))
-        root.add_child(item('eacoin', url))
-        root.add_child(item('facility', url))
-        root.add_child(item('lobby', url))
-        root.add_child(item('local', url))
-        root.add_child(item('message', url))
-        root.add_child(item('package', url))
-        root.add_child(item('pcbevent', url))
-        root.add_child(item('pcbtracker', url))
-        root.add_child(item('pkglist', url))
-        root.add_child(item('posevent', url))
-        for srv in self.extra_services():
-            root.add_child(item(srv, url))
-
-        root.add_child(item('ntp', 'ntp://pool.ntp.org/'))
-
-        keepalive = self.config['server']['host']
-        # Translate to a raw IP because we can't give out a host here
-        keepalive = socket.gethostbyname(keepalive)
-        root.add_child(item(
+        url = f'http://{host}:{port}/'
+        items = [
+            item(srv, url)
+            for srv in [
+                'cardmng',
+                'dlstatus',
+                'eacoin',
+                'facility',
+                'lobby',
+                'local',
+                'message',
+                'package',
+                'pcbevent',
+                'pcbtracker',
+                'pkglist',
+                'posevent',
+                *extra_services,
+            ]
+        ]
+        items.append(item('ntp', 'ntp://pool.ntp.org/'))
+        items.append(item(
             'keepalive',
             f'http://{keepalive}/core/keepalive?pa={keepalive}&ia={keepalive}&ga={keepalive}&ma={keepalive}&t1=2&t2=10',
         ))
-        return root
+        return items
 
     async def handle_pcbtracker_alive_request(self, request: Node) -> Node:
         """
@@ -71,22 +158,28 @@ class CoreHandler(Base):
         """
         Handle a PCBEvent request. We do nothing for this aside from logging the event.
         """
+        model = str(self.model)
+        pcbid = self.config['machine']['pcbid']
+        ip = self.config['client']['address']
+
+        events = []
+        timestamps = []
         for item in request.children:
             if item.name == 'item':
-                name = item.child_value('name')
-                value = item.child_value('value')
-                timestamp = item.child_value('time')
-                await self.data.local.network.put_event(
+                events.append((
                     'pcbevent',
                     {
-                        'name': name,
-                        'value': value,
-                        'model': str(self.model),
-                        'pcbid': self.config['machine']['pcbid'],
-                        'ip': self.config['client']['address'],
+                        'name': item.child_value('name'),
+                        'value': item.child_value('value'),
+                        'model': model,
+                        'pcbid': pcbid,
+                        'ip': ip,
                     },
-                    timestamp=timestamp,
-                )
+                ))
+                timestamps.append(item.child_value('time'))
+
+        # Cabinets send these in batches, so write the whole batch with one statement.
+        await self.data.local.network.put_events_bulk(events, timestamps=timestamps)
 
         return Node.void('pcbevent')
 
@@ -122,7 +215,14 @@ class CoreHandler(Base):
         which expects to return a bunch of information about the arcade this
         cabinet is in, as well as some settings for URLs and the name of the cab.
         """
-        machine = await self.data.local.machine.get_machine(self.config['machine']['pcbid'])
+        machine = await self._machine()
+
+        show_title = '%s %s' % (self.config['settings'].appname, self.config['settings'].version)
+        static = _FACILITY_STATIC.get(show_title)
+        if static is None:
+            static = CoreHandler.__facility_static(show_title)
+            _FACILITY_STATIC[show_title] = static
+        line, public, share = static
 
         root = Node.void('facility')
         root.set_attribute('expire', '600')
@@ -133,15 +233,29 @@ class CoreHandler(Base):
         location.add_child(Node.string('name', machine.name))
         location.add_child(Node.u8('type', 0))
 
-        line = Node.void('line')
-        line.add_child(Node.string('id', '.'))
-        line.add_child(Node.u8('class', 0))
-
         portfw = Node.void('portfw')
         portfw.add_child(Node.ipv4('globalip', self.config['client']['address']))
         portfw.add_child(Node.u16('globalport', machine.port))
         portfw.add_child(Node.u16('privateport', machine.port))
 
+        root.add_child(location)
+        root.add_child(line)
+        root.add_child(portfw)
+        root.add_child(public)
+        root.add_child(share)
+        return root
+
+    @staticmethod
+    def __facility_static(show_title: str) -> Tuple[Node, Node, Node]:
+        """
+        Build the line, public and share nodes for a facility.get response, which
+        don't depend on the machine. These are never modified once built, so they
+        can be shared between responses.
+        """
+        line = Node.void('line')
+        line.add_child(Node.string('id', '.'))
+        line.add_child(Node.u8('class', 0))
+
         public = Node.void('public')
         public.add_child(Node.u8('flag', 1))
         public.add_child(Node.string('name', '.'))
@@ -157,7 +271,6 @@ class CoreHandler(Base):
         eapass = Node.void('eapass')
         eapass.add_child(Node.u16('valid', 365))
 
-        show_title = '%s %s' % (self.config['settings'].appname, self.config['settings'].version)
         url = Node.void('url')
         url.add_child(Node.string('eapass', show_title))
         url.add_child(Node.string('arcadefan', show_title))
@@ -168,9 +281,4 @@ class CoreHandler(Base):
         share.add_child(eacoin)
         share.add_child(url)
         share.add_child(eapass)
-        root.add_child(location)
-        root.add_child(line)
-        root.add_child(portfw)
-        root.add_child(public)
-        root.add_child(share)
-        return root
+        return (line, public, share)
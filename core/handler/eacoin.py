@@ -10,6 +10,8 @@ class PASELIHandler(Base):
     A mixin that can be used to provide PASELI services to a game.
     """
 
+    __slots__ = ()
+
     INFINITE_PASELI_AMOUNT = 1114
 
     """
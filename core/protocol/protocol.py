@@ -1,6 +1,6 @@
 import binascii
 import hashlib
-from typing import Optional
+from typing import Iterator, Optional, Tuple
 from typing_extensions import Final
 
 from .lz77 import Lz77
@@ -30,6 +30,9 @@ class EAmuseProtocol:
     UTF_8: Final[str] = "utf-8"
     ASCII: Final[str] = "ascii"
 
+    # Size of each chunk of an encoded packet returned by encode_chunks.
+    CHUNK_SIZE: Final[int] = 16 * 1024
+
     def __init__(self) -> None:
         """
         Initialize the object.
@@ -48,9 +51,24 @@ class EAmuseProtocol:
         Returns:
             binary string representing the encrypted/decrypted data
         """
+        return b''.join(self._rc4_crypt_chunks(data, key, max(len(data), 1)))
+
+    def _rc4_crypt_chunks(self, data: bytes, key: bytes, chunk_size: int) -> Iterator[bytes]:
+        """
+        Given a data blob and a key blob, perform RC4 encryption/decryption one chunk at
+        a time. The keystream carries over between chunks, so the concatenated output is
+        identical to that of _rc4_crypt.
+
+        Parameters:
+            data - Binary string representing data to be encrypted/decrypted
+            key - Binary string representing the key to use
+            chunk_size - Maximum number of bytes to return per chunk
+
+        Returns:
+            An iterator of binary strings representing the encrypted/decrypted data
+        """
         S = list(range(256))
         j = 0
-        out = []
 
         # KSA Phase
         for i in range(256):
@@ -59,13 +77,37 @@ class EAmuseProtocol:
 
         # PRGA Phase
         i = j = 0
-        for char in data:
-            i = (i + 1) & 0xFF
-            j = (j + S[i]) & 0XFF
-            S[i], S[j] = S[j], S[i]
-            out.append(char ^ S[(S[i] + S[j]) & 0xFF])
+        for start in range(0, len(data), chunk_size):
+            out = bytearray()
+            for char in data[start:start + chunk_size]:
+                i = (i + 1) & 0xFF
+                j = (j + S[i]) & 0XFF
+                S[i], S[j] = S[j], S[i]
+                out.append(char ^ S[(S[i] + S[j]) & 0xFF])
+            yield bytes(out)
+
+    def __derive_key(self, encryption_key: Optional[str]) -> Optional[bytes]:
+        """
+        Given an optional encryption key as sent by the client, derive the RC4 key.
+
+        Parameters:
+            encryption_key - A string encryption key as returned from a HTTP request.
+                             Should be in the form 1-xxyyzzww-aabb.
+
+        Returns:
+            binary string representing the RC4 key, or None if there is no encryption.
+        """
+        if not encryption_key:
+            return None
+
+        # Key is concatenated with the shared secret above
+        version, first, second = encryption_key.split('-')
+        key = binascii.unhexlify((first + second).encode('ascii')) + EAmuseProtocol.SHARED_SECRET
 
-        return bytes(out)
+        # Next, key is sent through MD5 to derive the real key
+        m = hashlib.md5()
+        m.update(key)
+        return m.digest()
 
     def __decrypt(self, encryption_key: Optional[str], data: bytes) -> bytes:
         """
@@ -83,17 +125,7 @@ class EAmuseProtocol:
         if data is None:
             return None
 
-        key: Optional[bytes] = None
-        if encryption_key:
-            # Key is concatenated with the shared secret above
-            version, first, second = encryption_key.split('-')
-            key = binascii.unhexlify((first + second).encode('ascii')) + EAmuseProtocol.SHARED_SECRET
-
-            # Next, key is sent through MD5 to derive the real key
-            m = hashlib.md5()
-            m.update(key)
-            key = m.digest()
-
+        key = self.__derive_key(encryption_key)
         if key:
             # This is an encrypted old-style packet
             return self._rc4_crypt(data, key)
@@ -273,6 +305,59 @@ class EAmuseProtocol:
         Returns:
             A blob of data representing the encoded packet.
         """
+        data = self.__encode_and_compress(compression, tree, text_encoding, packet_encoding)
+        return self.__encrypt(encryption, data)
+
+    def encode_chunks(
+        self,
+        compression: Optional[str],
+        encryption: Optional[str],
+        tree: Node,
+        text_encoding: Optional[str]=None,
+        packet_encoding: Optional[int]=None,
+        chunk_size: int=CHUNK_SIZE,
+    ) -> Tuple[int, Iterator[bytes]]:
+        """
+        Identical to encode, but returns the packet as an iterator of chunks. The tree is
+        encoded and compressed up front, but encryption is only performed as chunks are
+        consumed, so large packets can be sent while the rest is still being encrypted.
+
+        Parameters:
+            compression - A string specifying the compression type, should be 'lz77' or 'none'.
+                          The python value None can also be passed in.
+            encryption - A string specifying the encryption key, or None if no encryption.
+            data - A binary string of data to parse.
+            text_encoding - A text encoding to use. See encode for details.
+            packet_encpding - A packet encoding to use. See encode for details.
+            chunk_size - Maximum number of bytes in each chunk.
+
+        Returns:
+            A tuple of the total length of the encoded packet and an iterator of blobs which
+            together make up the encoded packet.
+        """
+        data = self.__encode_and_compress(compression, tree, text_encoding, packet_encoding)
+        key = self.__derive_key(encryption)
+        if key:
+            # RC4 doesn't change the length of the data
+            return (len(data), self._rc4_crypt_chunks(data, key, chunk_size))
+
+        view = memoryview(data)
+        return (len(data), (bytes(view[start:start + chunk_size]) for start in range(0, len(data), chunk_size)))
+
+    def __encode_and_compress(
+        self,
+        compression: Optional[str],
+        tree: Node,
+        text_encoding: Optional[str],
+        packet_encoding: Optional[int],
+    ) -> bytes:
+        """
+        Given a Node tree, encode and optionally compress it, resolving the encodings
+        from the last decoded packet if they are not provided. See encode for parameters.
+
+        Returns:
+            binary string representing the encoded, compressed but unencrypted packet.
+        """
         # Either auto-set response based on request, or explicitly override in parameters
         if text_encoding is None:
             text_encoding = self.last_text_encoding
@@ -289,5 +374,4 @@ class EAmuseProtocol:
         self.last_packet_encoding = None
 
         data = self.__encode(tree, text_encoding, packet_encoding)
-        data = self.__compress(compression, data)
-        return self.__encrypt(encryption, data)
+        return self.__compress(compression, data)
@@ -1,13 +1,11 @@
-import asyncio
 import os
-import yaml
 import multiprocessing
 
 import core
 
 from typing import Any, Dict
 from uvicorn import Server, Config
-from core.data.data import Data
+from core.config import load_yaml
 from core import root_exe
 
 DEBUG = False
@@ -15,38 +13,66 @@ core.DEBUG = DEBUG
 
 config: Dict[str, Any] = {}
 
+# Use the C event loop and HTTP parser when they are installed. uvloop isn't available
+# on Windows, so there we let uvicorn pick.
+try:
+    import uvloop  # type: ignore
+    LOOP = "uvloop"
+except ImportError:
+    LOOP = "auto"
 
-class MyServer(Server):
-    async def run(self, sockets=None):
-        self.config.setup_event_loop()
-        return await self.serve(sockets=sockets)
+try:
+    import httptools  # type: ignore
+    HTTP = "httptools"
+except ImportError:
+    HTTP = "auto"
 
 
 def load_config(filename: str) -> None:
-    config.update(yaml.safe_load(open(filename)))
-    config['database']['engine'] = Data.create_engine(config)
-    config['appname'] = 'Oxygen'
+    # Only the server section is needed here. Each server process loads the config
+    # again at startup and creates its own engine, since an engine's connections
+    # can't be shared across processes. When processes are forked that second load
+    # is served from load_yaml's in-process cache, otherwise from its sidecar file.
+    config.update(load_yaml(filename))
 
 
-async def run() -> None:
-    global config
-    global DEBUG
+def serve(server: str, host: str, port: int) -> None:
+    """
+    Run one of our servers until it is shut down. This is the entry point of
+    each server process.
+    """
+    Server(config=Config("core.%s:app" % server,
+                         host=host,
+                         port=port,
+                         debug=DEBUG,
+                         loop=LOOP,
+                         http=HTTP,
+                         lifespan="on",
+                         access_log=DEBUG,
+                         log_level="info" if DEBUG else "warning",
+                         )).run()
 
-    multiprocessing.freeze_support()
-    apps = []
 
-    for server in ['backend', 'frontend']:
-        server = MyServer(config=Config("core.%s:app" % server,
-                                        host=config['server']['host'],
-                                        port=config["server"]["%s_port" % server],
-                                        debug=DEBUG,
-                                        ))
-        apps.append(server.run())
+def run() -> None:
+    global config
 
-    return await asyncio.gather(*apps)
+    # Each server gets its own process, and with it its own GIL and event loop, so
+    # a busy frontend can't hold up requests from cabinets or the other way around.
+    processes = [
+        multiprocessing.Process(
+            target=serve,
+            name=server,
+            args=(server, config['server']['host'], config["server"]["%s_port" % server]),
+        )
+        for server in ['backend', 'frontend']
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     load_config(os.path.join(root_exe, "config.yaml"))
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(run())
+    run()
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+import pytest
+
+from core.data import Data
+
+
+@pytest.fixture
+def config(tmp_path: Any) -> Dict[str, Any]:
+    """
+    A minimal config pointing at an empty sqlite database in a temporary directory.
+    """
+    return {'database': {'filename': str(tmp_path / 'oxygen.db')}}
+
+
+@pytest.fixture
+def run_with_data(config: Dict[str, Any]) -> Callable[[Callable[[Data], Awaitable[None]]], None]:
+    """
+    Returns a function which, given an async test body, creates the database, runs the
+    body with a Data object and tears everything down again. The engine is created and
+    disposed inside the same event loop that uses it.
+    """
+    def run(body: Callable[[Data], Awaitable[None]]) -> None:
+        async def wrapper() -> None:
+            config['database']['engine'] = Data.create_engine(config)
+            try:
+                data = Data(config)
+                try:
+                    await data.create()
+                    await body(data)
+                finally:
+                    await data.close()
+            finally:
+                await config['database']['engine'].dispose()
+
+        asyncio.run(wrapper())
+
+    return run
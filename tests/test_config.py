@@ -0,0 +1,96 @@
+import datetime
+import json
+import os
+from typing import Any, Iterator
+
+import pytest
+
+from core import config
+from core.config import load_yaml
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> Iterator[None]:
+    # Every test starts out as if it were a fresh process
+    config._YAML_CACHE.clear()
+    yield
+    config._YAML_CACHE.clear()
+
+
+def write(path: Any, contents: str, mtime_ns: int) -> None:
+    path.write_text(contents)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def sidecar(path: Any) -> Any:
+    with open(str(path) + '.cache', 'rb') as fp:
+        return json.loads(fp.read())
+
+
+def test_sidecar_is_written_and_used(tmp_path: Any) -> None:
+    path = tmp_path / 'config.yaml'
+    write(path, 'server:\n  host: 127.0.0.1\n  port: 80\n', 1_000_000_000_000)
+    assert load_yaml(str(path)) == {'server': {'host': '127.0.0.1', 'port': 80}}
+
+    cached = sidecar(path)
+    assert cached['mtime_ns'] == 1_000_000_000_000
+    assert cached['data'] == {'server': {'host': '127.0.0.1', 'port': 80}}
+
+    # Prove that a new process trusts the sidecar rather than the YAML while both still match
+    cached['data']['server']['port'] = 8080
+    with open(str(path) + '.cache', 'w') as fp:
+        json.dump(cached, fp)
+    config._YAML_CACHE.clear()
+    assert load_yaml(str(path)) == {'server': {'host': '127.0.0.1', 'port': 8080}}
+
+
+@pytest.mark.parametrize('contents,mtime_ns', [
+    # Same mtime, different size
+    ('server:\n  host: 127.0.0.1\n  port: 8080\n', 1_000_000_000_000),
+    # Same size, different mtime
+    ('server:\n  host: 127.0.0.1\n  port: 81\n', 2_000_000_000_000),
+])
+def test_sidecar_is_invalidated_by_changes(tmp_path: Any, contents: str, mtime_ns: int) -> None:
+    path = tmp_path / 'config.yaml'
+    write(path, 'server:\n  host: 127.0.0.1\n  port: 80\n', 1_000_000_000_000)
+    load_yaml(str(path))
+
+    # Both the in-process cache and the sidecar must notice
+    write(path, contents, mtime_ns)
+    expected = {'server': {'host': '127.0.0.1', 'port': int(contents.split('port: ')[1])}}
+    assert load_yaml(str(path)) == expected
+    config._YAML_CACHE.clear()
+    assert load_yaml(str(path)) == expected
+    assert sidecar(path)['mtime_ns'] == mtime_ns
+
+
+@pytest.mark.parametrize('garbage', [b'', b'{"mtime_ns": ', b'[1, 2, 3]', b'\x80\x81\x82'])
+def test_corrupt_sidecar_falls_back_to_yaml(tmp_path: Any, garbage: bytes) -> None:
+    path = tmp_path / 'config.yaml'
+    write(path, 'enabled: true\n', 1_000_000_000_000)
+    with open(str(path) + '.cache', 'wb') as fp:
+        fp.write(garbage)
+
+    assert load_yaml(str(path)) == {'enabled': True}
+    assert sidecar(path)['data'] == {'enabled': True}
+
+
+def test_sidecar_skipped_for_types_json_cannot_represent(tmp_path: Any) -> None:
+    path = tmp_path / 'config.yaml'
+    write(path, 'versions:\n  1: first\n  2: second\nstart: 2021-01-01\n', 1_000_000_000_000)
+
+    expected = {'versions': {1: 'first', 2: 'second'}, 'start': datetime.date(2021, 1, 1)}
+    assert load_yaml(str(path)) == expected
+    assert not os.path.exists(str(path) + '.cache')
+
+    config._YAML_CACHE.clear()
+    assert load_yaml(str(path)) == expected
+
+
+def test_callers_get_their_own_copy(tmp_path: Any) -> None:
+    path = tmp_path / 'config.yaml'
+    write(path, 'server:\n  host: 127.0.0.1\n', 1_000_000_000_000)
+
+    first = load_yaml(str(path))
+    first['server']['host'] = '0.0.0.0'
+    assert load_yaml(str(path)) == {'server': {'host': '127.0.0.1'}}
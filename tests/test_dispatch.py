@@ -0,0 +1,135 @@
+from typing import Any, Dict, Optional
+
+from core.base import Base, Factory
+from core.common import Model
+from core.data import Data
+from core.dispatch import Dispatch
+from core.protocol import Node
+
+
+class DispatchGame(Base):
+    game = 'TST'
+    version = 1
+    name = 'Dispatch Test Game'
+
+    def __init__(self, data: Data, config: Dict[str, Any], model: Model) -> None:
+        super().__init__(data, config, model)
+        self.handle_instance_get_request = self.__instance_handler
+
+    async def __instance_handler(self, request: Node) -> Node:
+        return Node.string('instance', self.config['machine']['pcbid'])
+
+    async def handle_bound_get_request(self, request: Node) -> Node:
+        return Node.string('bound', self.config['machine']['pcbid'])
+
+    async def handle_bound_request(self, request: Node) -> Node:
+        return Node.string('bound', 'generic')
+
+    @staticmethod
+    async def handle_static_get_request(request: Node) -> Node:
+        return Node.string('static', request.attribute('method'))
+
+    async def handle_fallthrough_get_request(self, request: Node) -> Optional[Node]:
+        return None
+
+    async def handle_fallthrough_request(self, request: Node) -> Node:
+        return Node.string('fallthrough', request.attribute('method'))
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('handle_dynamic_'):
+            async def handler(request: Node) -> Node:
+                return Node.string('dynamic', name)
+            return handler
+        raise AttributeError(name)
+
+
+class DispatchFactory(Factory):
+    MANAGED_CLASSES = [DispatchGame]
+
+    @classmethod
+    def register_all(cls) -> None:
+        Base.register('TST', cls)
+
+    @classmethod
+    def create(cls, data: Data, config: Dict[str, Any], model: Model, parentmodel: Optional[Model] = None) -> Optional[Base]:
+        return DispatchGame(data, config, model)
+
+
+DispatchFactory.register_all()
+
+
+def packet(pcbid: str, service: str, method: str, model: str = 'TST:J:A:A:2021010100') -> Node:
+    root = Node.void('call')
+    root.set_attribute('model', model)
+    root.set_attribute('srcid', pcbid)
+    request = Node.void(service)
+    request.set_attribute('method', method)
+    root.add_child(request)
+    return root
+
+
+def dispatch(run_with_data: Any, *packets: Node) -> list:
+    responses = []
+
+    async def body(data: Data) -> None:
+        dispatcher = Dispatch({}, data, False)
+        for tree in packets:
+            responses.append(await dispatcher.handle(tree))
+
+    run_with_data(body)
+    return responses
+
+
+def test_method_handlers_bind_to_each_game_instance(run_with_data: Any) -> None:
+    first, second = dispatch(
+        run_with_data,
+        packet('0101020304050607', 'bound', 'get'),
+        packet('0101020304050608', 'bound', 'get'),
+    )
+    assert first.children[0].name == 'bound'
+    assert first.children[0].value == '0101020304050607'
+    assert second.children[0].value == '0101020304050608'
+    assert first.attribute('dstid') == '0101020304050607'
+    assert first.children[0].attribute('status') == '0'
+
+
+def test_instance_attribute_handlers(run_with_data: Any) -> None:
+    first, second = dispatch(
+        run_with_data,
+        packet('0101020304050607', 'instance', 'get'),
+        packet('0101020304050608', 'instance', 'get'),
+    )
+    assert first.children[0].value == '0101020304050607'
+    assert second.children[0].value == '0101020304050608'
+
+
+def test_static_handlers(run_with_data: Any) -> None:
+    response, = dispatch(run_with_data, packet('0101020304050607', 'static', 'get'))
+    assert response.children[0].name == 'static'
+    assert response.children[0].value == 'get'
+
+
+def test_getattr_handlers(run_with_data: Any) -> None:
+    response, = dispatch(run_with_data, packet('0101020304050607', 'dynamic', 'get'))
+    assert response.children[0].value == 'handle_dynamic_get_request'
+
+
+def test_generic_handlers(run_with_data: Any) -> None:
+    first, second = dispatch(
+        run_with_data,
+        packet('0101020304050607', 'bound', 'put'),
+        packet('0101020304050607', 'fallthrough', 'get'),
+    )
+    assert first.children[0].value == 'generic'
+    assert second.children[0].name == 'fallthrough'
+    assert second.children[0].value == 'get'
+
+
+def test_unknown_handlers(run_with_data: Any) -> None:
+    first, second = dispatch(
+        run_with_data,
+        packet('0101020304050607', 'missing', 'get'),
+        packet('0101020304050607', 'bound', 'get', model='XXX:J:A:A:2021010100'),
+    )
+    assert first is None
+    assert second is None
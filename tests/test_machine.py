@@ -0,0 +1,78 @@
+from typing import Any, Dict, List
+
+from core.data import ArcadeID, Data, UserID
+
+
+async def make_arcade(data: Data, data_dict: Dict[str, Any], owners: List[UserID]) -> ArcadeID:
+    # Inserted directly since MachineData.create_arcade can't be used on sqlite, it
+    # tries to fetch rows from the INSERT.
+    machines = data.local.machine
+    cursor = await machines.execute(
+        "INSERT INTO arcade (name, description, data, pin) VALUES ('Test Arcade', 'Somewhere', :data, '00000000')",
+        {'data': machines.serialize(data_dict)},
+    )
+    arcadeid = ArcadeID(cursor.lastrowid)
+    for owner in owners:
+        await machines.execute(
+            "INSERT INTO arcade_owner (userid, arcadeid) VALUES (:userid, :arcadeid)",
+            {'userid': owner, 'arcadeid': arcadeid},
+        )
+    return arcadeid
+
+
+def test_get_machine_with_arcade_matches_separate_lookups(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        machines = data.local.machine
+        arcadeid = await make_arcade(data, {'paseli_enabled': True}, [UserID(1), UserID(2)])
+        await machines.create_machine('0101020304050607', name='Cab', description='In the back', arcade=arcadeid)
+
+        result = await machines.get_machine_with_arcade('0101020304050607')
+        assert result is not None
+        pcb, joined = result
+        assert joined is not None
+
+        expected_pcb = await machines.get_machine('0101020304050607')
+        expected_arcade = await machines.get_arcade(arcadeid)
+        assert expected_pcb is not None
+        assert expected_arcade is not None
+
+        assert vars(pcb) == vars(expected_pcb)
+        assert sorted(joined.owners) == sorted(expected_arcade.owners)
+        assert {**vars(joined), 'owners': None} == {**vars(expected_arcade), 'owners': None}
+        assert joined.data.get_bool('paseli_enabled')
+
+    run_with_data(body)
+
+
+def test_get_machine_with_arcade_without_arcade(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        machines = data.local.machine
+        await machines.create_machine('0101020304050607')
+
+        result = await machines.get_machine_with_arcade('0101020304050607')
+        assert result is not None
+        pcb, arcade = result
+        assert arcade is None
+        expected = await machines.get_machine('0101020304050607')
+        assert expected is not None
+        assert vars(pcb) == vars(expected)
+
+        assert await machines.get_machine_with_arcade('0101020304050608') is None
+
+    run_with_data(body)
+
+
+def test_get_machine_with_arcade_without_owners(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        machines = data.local.machine
+        arcadeid = await make_arcade(data, {}, [])
+        await machines.create_machine('0101020304050607', arcade=arcadeid)
+
+        result = await machines.get_machine_with_arcade('0101020304050607')
+        assert result is not None
+        _, joined = result
+        assert joined is not None
+        assert joined.owners == []
+        assert vars(joined) == vars(await machines.get_arcade(arcadeid))
+
+    run_with_data(body)
@@ -0,0 +1,142 @@
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from core.data import Data, UserID
+from core.data.exceptions import ScoreSaveException
+
+GAME = 'sdvx'
+VERSION = 1
+USER = UserID(1)
+
+
+def attempt(songid: int, timestamp: int, points: int = 1000, new_record: bool = False) -> Dict[str, Any]:
+    return {
+        'userid': USER,
+        'songid': songid,
+        'songchart': 0,
+        'location': 5,
+        'points': points,
+        'data': {'combo': points // 10},
+        'new_record': new_record,
+        'timestamp': timestamp,
+    }
+
+
+async def history(data: Data) -> List[Tuple[int, int, int, str]]:
+    cursor = await data.local.music.execute("SELECT musicid, timestamp, points, data FROM score_history ORDER BY musicid, timestamp")
+    return [tuple(row) for row in cursor]
+
+
+def test_put_score_new_record_updates_timestamp_and_location(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        music = data.local.music
+        await music.put_score(GAME, VERSION, USER, 1, 0, 5, 1000, {'grade': 'A'}, True, timestamp=100)
+        await music.put_score(GAME, VERSION, USER, 1, 0, 6, 2000, {'grade': 'S'}, True, timestamp=200)
+
+        score = await music.get_score(GAME, VERSION, USER, 1, 0)
+        assert score is not None
+        assert score.points == 2000
+        assert score.data == {'grade': 'S'}
+        assert score.timestamp == 200
+        assert score.update == 200
+        assert score.location == 6
+
+    run_with_data(body)
+
+
+def test_put_score_points_only_keeps_timestamp_and_location(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        music = data.local.music
+        await music.put_score(GAME, VERSION, USER, 1, 0, 5, 1000, {'grade': 'A'}, True, timestamp=100)
+        await music.put_score(GAME, VERSION, USER, 1, 0, 6, 1000, {'grade': 'A', 'clear': 2}, False, timestamp=200)
+
+        score = await music.get_score(GAME, VERSION, USER, 1, 0)
+        assert score is not None
+        assert score.data == {'grade': 'A', 'clear': 2}
+        assert score.timestamp == 100
+        assert score.update == 200
+        assert score.location == 5
+
+    run_with_data(body)
+
+
+def test_record_play(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        music = data.local.music
+        await music.record_play(GAME, VERSION, USER, 1, 0, 5, 900, {'combo': 90}, 900, {'combo': 90}, True, timestamp=100)
+        await music.record_play(GAME, VERSION, USER, 1, 0, 6, 800, {'combo': 80}, 900, {'combo': 90}, False, timestamp=200)
+
+        score = await music.get_score(GAME, VERSION, USER, 1, 0)
+        assert score is not None
+        assert score.points == 900
+        assert score.data == {'combo': 90}
+        assert score.timestamp == 100
+        assert score.update == 200
+        assert score.location == 5
+        assert score.plays == 2
+        assert [timestamp for (_, timestamp, _, _) in await history(data)] == [100, 200]
+
+    run_with_data(body)
+
+
+def test_record_play_collision_saves_nothing(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        music = data.local.music
+        await music.record_play(GAME, VERSION, USER, 1, 0, 5, 900, {}, 900, {}, True, timestamp=100)
+
+        with pytest.raises(ScoreSaveException):
+            await music.record_play(GAME, VERSION, USER, 1, 0, 6, 1000, {}, 1000, {}, True, timestamp=100)
+
+        # The high score must not have been updated by the failed play
+        score = await music.get_score(GAME, VERSION, USER, 1, 0)
+        assert score is not None
+        assert score.points == 900
+        assert score.location == 5
+        assert score.plays == 1
+
+    run_with_data(body)
+
+
+def test_put_attempts_bulk_matches_put_attempt(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        music = data.local.music
+        attempts = [attempt(1, 100), attempt(2, 100, new_record=True), attempt(1, 200, points=1200)]
+        await music.put_attempts_bulk(GAME, VERSION, attempts)
+        bulk = await history(data)
+
+        await music.execute("DELETE FROM score_history")
+        for params in attempts:
+            await music.put_attempt(
+                GAME,
+                VERSION,
+                params['userid'],
+                params['songid'],
+                params['songchart'],
+                params['location'],
+                params['points'],
+                params['data'],
+                params['new_record'],
+                timestamp=params['timestamp'],
+            )
+        single = await history(data)
+
+        assert len(bulk) == 3
+        assert bulk == single
+
+    run_with_data(body)
+
+
+def test_put_attempts_bulk_collision_saves_the_rest(run_with_data: Any) -> None:
+    async def body(data: Data) -> None:
+        music = data.local.music
+        await music.put_attempts_bulk(GAME, VERSION, [attempt(1, 100)])
+
+        with pytest.raises(ScoreSaveException) as excinfo:
+            await music.put_attempts_bulk(GAME, VERSION, [attempt(2, 100), attempt(1, 100, points=5), attempt(3, 100)])
+        assert 'at 100' in str(excinfo.value)
+
+        rows = await history(data)
+        assert [(musicid // 10000, points) for (musicid, _, points, _) in rows] == [(1, 1000), (2, 1000), (3, 1000)]
+
+    run_with_data(body)
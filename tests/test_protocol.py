@@ -0,0 +1,51 @@
+from typing import Optional
+
+import pytest
+
+from core.protocol import EAmuseProtocol, Node
+
+
+def tree() -> Node:
+    root = Node.void('response')
+    game = Node.void('game')
+    root.add_child(game)
+    game.set_attribute('status', '0')
+    for i in range(200):
+        entry = Node.void('music')
+        entry.add_child(Node.u32('id', i))
+        entry.add_child(Node.string('name', f'Song number {i}'))
+        entry.add_child(Node.u32_array('scores', [i * 10, i * 20, i * 30]))
+        game.add_child(entry)
+    return root
+
+
+@pytest.mark.parametrize('encryption', [None, '1-5f1a2b3c-1234'])
+@pytest.mark.parametrize('compression', [None, 'lz77'])
+@pytest.mark.parametrize('packet_encoding', [EAmuseProtocol.BINARY, EAmuseProtocol.XML])
+@pytest.mark.parametrize('chunk_size', [1, 7, 256, EAmuseProtocol.CHUNK_SIZE])
+def test_encode_chunks_matches_encode(
+    encryption: Optional[str],
+    compression: Optional[str],
+    packet_encoding: int,
+    chunk_size: int,
+) -> None:
+    protocol = EAmuseProtocol()
+    expected = protocol.encode(compression, encryption, tree(), EAmuseProtocol.SHIFT_JIS, packet_encoding)
+    length, chunks = protocol.encode_chunks(
+        compression,
+        encryption,
+        tree(),
+        EAmuseProtocol.SHIFT_JIS,
+        packet_encoding,
+        chunk_size=chunk_size,
+    )
+    chunks = list(chunks)
+
+    assert length == len(expected)
+    assert b''.join(chunks) == expected
+    assert all(0 < len(chunk) <= chunk_size for chunk in chunks)
+
+    decoded = EAmuseProtocol().decode(compression, encryption, b''.join(chunks))
+    assert decoded is not None
+    assert decoded.child('game/music').child_value('name') == 'Song number 0'
+